@@ -1,408 +1,210 @@
 import os
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.common.by import By
-import time
-import html
-import re
-from urllib.parse import unquote
+import threading
+from contextlib import contextmanager
 import traceback
 
-def encode_title_for_filename(title):
-    """
-    将标题中的特殊字符编码为HTML实体形式，用于文件名
-    """
-    if pd.isna(title):
-        return "untitled"
-    
-    title = str(title).strip()
-    
-    # 首先解码已存在的HTML实体
-    title = html.unescape(title)
-    
-    # 处理URL编码
-    title = unquote(title)
-    
-    # 将文件名不允许的特殊字符编码为HTML实体（去掉&和;以适应文件名）
-    char_map = {
-        '<': '#x3c;',
-        '>': '#x3e;', 
-        ':': '#x3a;',
-        '"': '#x22;',
-        '/': '#x2f;',
-        '\\': '#x5c;',
-        '|': '#x7c;',
-        '?': '#x3f;',
-        '*': '#x2a;'
-    }
-    
-    for char, encoded in char_map.items():
-        title = title.replace(char, encoded)
-    
-    # 移除多余的空格，移除末尾的点号
-    title = re.sub(r'\s+', ' ', title).strip().rstrip('.')
-    
-    # 限制文件名长度
-    if len(title) > 200:
-        title = title[:200]
-    
-    return title
+from dedup import load_non_canonical_keys
+from browser_download import click_element, timed, wait_for_clickable
+from csv_ingest import build_work_list, encode_titles, read_csv_folder
+from download_job import ask_job_mode, plan_records
+from browser_session import HybridDownloader, with_query
+from edge_browser import BrowserProvider, setup_edge_driver
+from providers import DownloadError, Provider
+from scheduler import DownloadScheduler, write_failed_records
+
+# INFORMS 文章页上的下载按钮
+DOWNLOAD_SELECTORS = [
+    # INFORMS特定的下载按钮选择器
+    'a[data-download-files-key="pdf"][data-original-title="Download"]',
+    'a[data-download-files-key="pdf"]',
+    'a[aria-label*="Download PDF"]',
+    'a.navbar-download.btn.btn--cta_roundedColored',
+    'a[href*="download=true"]',
+    'a[target="_blank"][href*="/doi/pdf/"]',
+    'button[data-download-files-key="pdf"]',
+    'a[class*="download"][class*="btn"]',
+    '.navbar-download',
+    '[data-single-download="true"]'
+]
+
+# 由标题生成文件名：没有标题时为 untitled，最长 200 个字符
+FILENAME_OPTIONS = {'default': "untitled", 'max_length': 200}
 
-def setup_edge_driver():
+def load_informs_records(library, input_folder, duplicates_csv=None):
     """
-    设置Edge浏览器驱动，配置下载设置
+    读取文件夹（含子文件夹）中的INFORMS元数据CSV（Title、PDF_Link 列），返回尚未下载的记录
     """
-    edge_options = Options()
-    
-    # 设置下载路径为临时目录
-    download_dir = os.path.join(os.getcwd(), "temp_downloads")
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
-    
-    # 配置下载设置
-    prefs = {
-        "download.default_directory": download_dir,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "safebrowsing.enabled": True,
-        "plugins.always_open_pdf_externally": True
-    }
-    edge_options.add_experimental_option("prefs", prefs)
-    
-    # 使用现有的Edge用户配置
-    try:
-        user_data_dir = os.path.expanduser("~\\AppData\\Local\\Microsoft\\Edge\\User Data")
-        if os.path.exists(user_data_dir):
-            edge_options.add_argument(f"--user-data-dir={user_data_dir}")
-            edge_options.add_argument("--profile-directory=Default")
-    except:
-        print("无法使用用户配置，将使用临时配置")
-    
-    # 其他选项
-    edge_options.add_argument("--no-sandbox")
-    edge_options.add_argument("--disable-dev-shm-usage")
-    edge_options.add_argument("--disable-blink-features=AutomationControlled")
-    edge_options.add_argument("--disable-extensions")
-    edge_options.add_argument("--disable-logging")
-    edge_options.add_argument("--log-level=3")
-    edge_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
-    edge_options.add_experimental_option('useAutomationExtension', False)
-    
-    try:
-        driver = webdriver.Edge(options=edge_options)
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        print("Edge浏览器启动成功")
-        return driver, download_dir
-    except Exception as e:
-        print(f"启动Edge浏览器失败: {e}")
-        return None, None
+    # 近似重复记录（非规范成员）不再下载
+    skip_titles = set()
+    if duplicates_csv is not None:
+        skip_titles = load_non_canonical_keys(duplicates_csv, 'informs')
+        print(f"将跳过 {len(skip_titles)} 条近似重复记录")
+
+    def prepare(df, csv_file):
+        if 'PDF_Link' not in df.columns:
+            print(f"错误: {os.path.basename(csv_file)} 缺少PDF_Link列，跳过此文件")
+            return None
+        if 'Title' not in df.columns:
+            print(f"警告: {os.path.basename(csv_file)} 缺少Title列，将使用序号命名")
+            df['Title'] = df.index.astype(str)
+        return df
+
+    df = read_csv_folder(input_folder, prepare)
+    if df.empty:
+        return []
+
+    df['pdf_filename'] = encode_titles(df['Title'], **FILENAME_OPTIONS) + '.pdf'
+    df = build_work_list(df, library, 'PDF_Link', 'Title', skip_titles)
+    records = df[['Title', 'PDF_Link', 'pdf_filename', 'csv_file']].rename(
+        columns={'Title': 'title', 'PDF_Link': 'pdf_link'}).to_dict('records')
+    return records
 
-def wait_for_download_complete(download_dir, timeout=180):
+class InformsBrowserProvider(BrowserProvider):
     """
-    等待下载完成
+    INFORMS 浏览器下载：打开 PDF_Link 页面并点击下载按钮
+    *_timeout 为各步骤的最长等待秒数
     """
-    start_time = time.time()
-    
-    # 记录初始文件列表
-    initial_files = set()
-    if os.path.exists(download_dir):
-        initial_files = set(os.listdir(download_dir))
-    
-    print(f"等待下载完成...")
-    last_status_time = start_time
-    
-    while time.time() - start_time < timeout:
+
+    name = 'informs'
+    min_interval = 8
+    url_key = 'pdf_link'
+    filename_options = FILENAME_OPTIONS
+    legacy_fixed_sleeps = {'page_load': 8, 'scroll': 2}
+
+    def __init__(self, output_folder="informs_pdfs", layout=None, workers=None, lean=False, page_timeout=30,
+                 button_timeout=60, download_timeout=120):
+        super().__init__(output_folder, layout, workers, lean, page_timeout, download_timeout)
+        self.button_timeout = button_timeout
+
+    def load_records(self, input_folder, duplicates_csv=None):
+        return load_informs_records(self.library, input_folder, duplicates_csv)
+
+    def trigger_download(self, driver, record):
+        print("查找下载按钮...")
+        with timed(self.stats, 'button'):
+            element, selector = wait_for_clickable(driver, DOWNLOAD_SELECTORS, self.button_timeout,
+                                                   cache=self.selector_cache, name='download')
+        if element is None:
+            raise DownloadError(f"在{self.button_timeout}秒内未找到下载按钮")
+        
+        print(f"✓ 找到下载按钮: {selector}")
         try:
-            if not os.path.exists(download_dir):
-                time.sleep(2)
-                continue
-                
-            current_files = set(os.listdir(download_dir))
-            
-            # 检查是否有下载中的文件
-            downloading_files = [f for f in current_files if f.endswith('.crdownload') or f.endswith('.tmp')]
-            
-            if downloading_files:
-                # 每30秒显示一次下载中状态
-                if time.time() - last_status_time >= 30:
-                    elapsed = int(time.time() - start_time)
-                    print(f"  [{elapsed}s] 正在下载: {downloading_files[0]}")
-                    last_status_time = time.time()
-            
-            if not downloading_files:
-                # 检查是否有新的PDF文件
-                new_files = current_files - initial_files
-                pdf_files = [f for f in new_files if f.endswith('.pdf')]
-                
-                if pdf_files:
-                    print(f"  检测到新的PDF文件: {pdf_files[0]}")
-                    pdf_files.sort(key=lambda x: os.path.getmtime(os.path.join(download_dir, x)), reverse=True)
-                    return pdf_files[0]
-                
-                # 也检查所有PDF文件（防止遗漏）
-                all_pdf_files = [f for f in current_files if f.endswith('.pdf')]
-                if all_pdf_files:
-                    all_pdf_files.sort(key=lambda x: os.path.getmtime(os.path.join(download_dir, x)), reverse=True)
-                    latest_file = all_pdf_files[0]
-                    file_path = os.path.join(download_dir, latest_file)
-                    file_time = os.path.getmtime(file_path)
-                    current_time = time.time()
-                    
-                    # 检查文件是否是最近的（5分钟内）
-                    if current_time - file_time < 300:
-                        print(f"  找到最近下载的文件: {latest_file}")
-                        return latest_file
-            
-            time.sleep(3)
-            
+            with timed(self.stats, 'scroll'):
+                click_element(driver, element)
+            print("✓ 已点击下载按钮")
         except Exception as e:
-            print(f"  检查下载状态时出错: {e}")
-            time.sleep(5)
-    
-    print(f"  下载等待超时({timeout}秒)")
-    return None
+            raise DownloadError(f"点击下载按钮时出错: {e}") from None
 
-def download_pdf_from_informs(driver, pdf_link, output_path, download_dir):
+def resolve_informs_pdf_url(pdf_link):
     """
-    从INFORMS下载PDF - 简化版本
+    INFORMS 的阅读器链接 (/doi/epdf/、/doi/reader/) 转为下载按钮指向的 /doi/pdf/...?download=true，
+    其他链接保持不变
     """
-    download_success = False
-    
-    try:
-        print(f"\n访问链接: {pdf_link}")
-        
-        # 访问链接
+    for viewer in ('/doi/epdf/', '/doi/reader/'):
+        pdf_link = pdf_link.replace(viewer, '/doi/pdf/')
+    if '/doi/pdf/' in pdf_link:
+        return with_query(pdf_link, download='true')
+    return pdf_link
+
+class InformsHybridProvider(Provider):
+    """
+    混合模式：所有工作者共用一个浏览器完成认证，PDF 由 HTTP 连接池直接下载（见 browser_session）。
+    第一次请求没有登录状态时会由浏览器打开链接完成认证。
+    """
+
+    name = 'informs-http'
+    workers = 4
+    min_interval = 1
+    # HTTP 下载失败的记录交给浏览器流程，不在这里重试
+    max_attempts = 1
+
+    def __init__(self, output_folder="informs_pdfs", layout=None, workers=None, lean=False):
+        super().__init__(output_folder, layout, workers)
+        self.lean = lean
+        self._lock = threading.Lock()
+        self._driver = None
+        self._downloader = None
+        self._failed = False
+
+    def load_records(self, input_folder, duplicates_csv=None):
+        return load_informs_records(self.library, input_folder, duplicates_csv)
+
+    def open_worker(self, worker_id):
+        with self._lock:
+            if self._downloader is None and not self._failed:
+                driver, _ = setup_edge_driver(lean=self.lean)
+                if not driver:
+                    self._failed = True
+                    return None
+                print(f"\n🔑 使用浏览器完成认证，然后用 {self.workers} 个HTTP连接并发下载...")
+                self._driver = driver
+                self._downloader = HybridDownloader(driver, pool_size=self.workers, resolve_url=resolve_informs_pdf_url)
+            return self._downloader
+
+    def close(self):
+        if self._downloader is not None:
+            print(f"重新认证 {self._downloader.reauth_count} 次")
+            self._downloader.close()
+        # 浏览器流程会使用同一个Edge配置，先关闭认证用的浏览器
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        self._driver = self._downloader = None
+
+    def resolve(self, context, record):
+        return record['pdf_link']
+
+    @contextmanager
+    def fetch(self, downloader, record, url):
+        path = f"{self.library.path_for(record['pdf_filename'])}.download"
         try:
-            driver.get(pdf_link)
-            print("✓ 页面访问成功")
-        except Exception as e:
-            print(f"✗ 页面访问失败: {e}")
-            return False
-        
-        # 等待页面加载
-        time.sleep(8)
-        
-        # 清理下载目录中的旧文件
-        if os.path.exists(download_dir):
-            for file in os.listdir(download_dir):
-                if file.endswith('.pdf') or file.endswith('.crdownload'):
-                    try:
-                        os.remove(os.path.join(download_dir, file))
-                    except:
-                        pass
-        
-        # 查找并点击INFORMS的下载按钮
-        print("查找下载按钮...")
-        
-        download_selectors = [
-            # INFORMS特定的下载按钮选择器
-            'a[data-download-files-key="pdf"][data-original-title="Download"]',
-            'a[data-download-files-key="pdf"]',
-            'a[aria-label*="Download PDF"]',
-            'a.navbar-download.btn.btn--cta_roundedColored',
-            'a[href*="download=true"]',
-            'a[target="_blank"][href*="/doi/pdf/"]',
-            'button[data-download-files-key="pdf"]',
-            'a[class*="download"][class*="btn"]',
-            '.navbar-download',
-            '[data-single-download="true"]'
-        ]
-        
-        download_button_found = False
-        max_attempts = 12  # 最多尝试60秒 (12 * 5秒)
-        
-        for attempt in range(max_attempts):
-            for selector in download_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    
-                    if elements:
-                        for element in elements:
-                            try:
-                                if element.is_displayed() and element.is_enabled():
-                                    print(f"✓ 找到下载按钮: {selector}")
-                                    
-                                    # 滚动到元素位置
-                                    driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                                    time.sleep(2)
-                                    
-                                    # 点击下载按钮
-                                    element.click()
-                                    print("✓ 已点击下载按钮")
-                                    
-                                    download_button_found = True
-                                    break
-                            except:
-                                continue
-                    
-                    if download_button_found:
-                        break
-                        
-                except:
-                    continue
-            
-            if download_button_found:
-                break
-            
-            if attempt < max_attempts - 1:
-                print(f"  尝试 {attempt + 1}/{max_attempts}，等待5秒后重试...")
-                time.sleep(5)
-        
-        if not download_button_found:
-            print("✗ 未找到下载按钮")
-            return False
-        
-        # 等待下载完成
-        downloaded_file = wait_for_download_complete(download_dir, timeout=120)
-        
-        if downloaded_file:
-            downloaded_path = os.path.join(download_dir, downloaded_file)
-            
-            if os.path.exists(downloaded_path):
-                file_size = os.path.getsize(downloaded_path)
-                print(f"  文件大小: {file_size:,} bytes")
-                
-                if file_size > 1000:  # 文件大小合理
-                    try:
-                        import shutil
-                        
-                        # 确保目标目录存在
-                        target_dir = os.path.dirname(output_path)
-                        if not os.path.exists(target_dir):
-                            os.makedirs(target_dir)
-                        
-                        # 移动文件到目标位置并重命名
-                        shutil.move(downloaded_path, output_path)
-                        print(f"✓ PDF下载成功: {os.path.basename(output_path)}")
-                        download_success = True
-                        
-                    except Exception as e:
-                        print(f"✗ 移动文件时出错: {e}")
-                else:
-                    print("✗ 下载的文件太小，可能不完整")
-            else:
-                print("✗ 下载的文件不存在")
-        else:
-            print("✗ 下载失败或超时")
-        
-        return download_success
-        
-    except Exception as e:
-        print(f"✗ 处理链接时发生错误: {e}")
-        return False
+            error = downloader.download(url, path)
+            if error:
+                raise DownloadError(f"HTTP下载失败: {error}")
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
 
-def process_csv_files(input_folder, output_folder):
+def process_csv_files(input_folder, output_folder, duplicates_csv=None, layout=None, workers=1, min_interval=8,
+                      timeouts=None, hybrid=False, http_workers=4, http_interval=1, lean=False, resume=True,
+                      retry_failed=False):
     """
-    处理CSV文件并下载PDF - 简化版本
+    处理CSV文件并下载PDF（InformsBrowserProvider + 统一调度器，见 scheduler）
+    duplicates_csv: dedup.py 输出的重复簇文件，跳过其中的非规范记录
+    layout: 输出文件夹的目录布局 ('flat'/'year'/'hash')，None 表示沿用已记录的布局，见 pdf_library
+    workers: 并行的浏览器数量，每个浏览器使用独立的配置副本和下载目录（见 browser_pool）
+    min_interval: 所有浏览器合计，相邻两次下载开始之间的最小间隔（秒）
+    lean: 使用精简无头浏览器（见 setup_edge_driver）
+    timeouts: 各步骤最长等待秒数，如 {'button_timeout': 60, 'download_timeout': 120}，见 InformsBrowserProvider
+    hybrid: 混合模式，浏览器只负责认证，PDF 由 http_workers 个HTTP连接并发下载（请求间隔至少 http_interval 秒），
+            HTTP下载失败的记录再交给浏览器流程
+    resume: 输出文件夹中有上次中断的任务时，从中断处继续（见 download_job）
+    retry_failed: 只重试上次失败的记录（按尝试次数退避），不读取CSV文件夹
     """
-    # 创建输出文件夹
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    # 设置浏览器驱动
-    driver, download_dir = setup_edge_driver()
-    if not driver:
-        return
-    
     try:
-        # 遍历所有CSV文件
-        csv_files = []
-        for root, dirs, files in os.walk(input_folder):
-            for file in files:
-                if file.endswith('.csv'):
-                    csv_files.append(os.path.join(root, file))
+        provider = InformsBrowserProvider(output_folder, layout, workers, lean, **(timeouts or {}))
+        failed_file = os.path.join(output_folder, "failed_downloads.csv")
+        job, records = plan_records(provider, lambda: provider.load_records(input_folder, duplicates_csv),
+                                    retry_failed, resume, failed_file)
         
-        print(f"\n找到 {len(csv_files)} 个CSV文件")
+        http_results = []
+        if hybrid and records:
+            http_provider = InformsHybridProvider(output_folder, layout, http_workers, lean)
+            # HTTP下载失败的原因作为一次尝试记入任务，记录仍为 pending，交给浏览器流程
+            results = DownloadScheduler(http_provider, http_workers, http_interval, job=job, final=False).run(records)
+            http_results = [(record, True) for record, success in results if success]
+            records = [record for record, success in results if not success]
+            if records:
+                print(f"{len(records)} 条记录HTTP下载失败，改用浏览器流程")
         
-        total_downloaded = 0
-        total_processed = 0
-        failed_downloads = []
+        print(f"\n共 {len(records)} 条待下载记录，使用 {workers} 个浏览器，下载间隔至少 {min_interval} 秒")
+        results = http_results + DownloadScheduler(provider, workers, min_interval, job=job).run(records)
         
-        for csv_file_idx, csv_file in enumerate(csv_files):
-            print(f"\n{'='*80}")
-            print(f"处理文件 [{csv_file_idx+1}/{len(csv_files)}]: {os.path.basename(csv_file)}")
-            print(f"{'='*80}")
-            
-            try:
-                # 读取CSV文件
-                df = pd.read_csv(csv_file, encoding='utf-8')
-                print(f"读取到 {len(df)} 条记录")
-                
-                # 检查必需的列
-                if 'Title' not in df.columns:
-                    print(f"警告: 缺少Title列，将使用序号命名")
-                    df['Title'] = df.index.astype(str)
-                
-                if 'PDF_Link' not in df.columns:
-                    print(f"错误: 缺少PDF_Link列，跳过此文件")
-                    continue
-                
-                # 处理标题
-                df['titlename'] = df['Title'].apply(encode_title_for_filename)
-                
-                # 过滤掉无效的链接
-                df_filtered = df[df['PDF_Link'].notna() & (df['PDF_Link'] != '')]
-                
-                print(f"有效链接: {len(df_filtered)} 条")
-                
-                if len(df_filtered) == 0:
-                    print("没有有效的链接，跳过此文件")
-                    continue
-                
-                # 下载PDF
-                for record_idx, (index, row) in enumerate(df_filtered.iterrows()):
-                    try:
-                        titlename = row['titlename']
-                        pdf_link = row['PDF_Link']
-                        original_title = row['Title']
-                        
-                        # 创建PDF文件路径
-                        pdf_filename = f"{titlename}.pdf"
-                        pdf_path = os.path.join(output_folder, pdf_filename)
-                        
-                        # 跳过已存在的文件
-                        if os.path.exists(pdf_path):
-                            print(f"[{record_idx+1}/{len(df_filtered)}] 已存在，跳过: {titlename[:50]}...")
-                            continue
-                        
-                        total_processed += 1
-                        
-                        print(f"\n{'*'*60}")
-                        print(f"[{total_processed}] [{record_idx+1}/{len(df_filtered)}] 开始下载:")
-                        print(f"标题: {original_title[:80]}...")
-                        print(f"文件名: {titlename[:80]}...")
-                        print(f"{'*'*60}")
-                        
-                        # 下载PDF
-                        success = download_pdf_from_informs(driver, pdf_link, pdf_path, download_dir)
-                        
-                        if success:
-                            total_downloaded += 1
-                            print(f"✅ 下载成功! ({total_downloaded}/{total_processed})")
-                        else:
-                            print(f"❌ 下载失败! ({total_downloaded}/{total_processed})")
-                            failed_downloads.append({
-                                'title': original_title,
-                                'pdf_link': pdf_link,
-                                'csv_file': os.path.basename(csv_file)
-                            })
-                        
-                        # 显示进度
-                        success_rate = (total_downloaded/total_processed*100) if total_processed > 0 else 0
-                        print(f"📊 当前进度: 成功 {total_downloaded} | 失败 {total_processed - total_downloaded} | 成功率 {success_rate:.1f}%")
-                        
-                        # 休息一下
-                        print("休息8秒后继续...")
-                        time.sleep(8)
-                        
-                    except Exception as e:
-                        print(f"处理单个记录时出错: {e}")
-                        continue
-                
-            except Exception as e:
-                print(f"处理CSV文件时出错: {e}")
-                continue
+        total_processed = len(results)
+        total_downloaded = sum(1 for _, success in results if success)
         
         # 显示最终统计结果
         print(f"\n{'='*80}")
@@ -415,40 +217,17 @@ def process_csv_files(input_folder, output_folder):
             success_rate = (total_downloaded/total_processed*100)
             print(f"  成功率: {success_rate:.1f}%")
         
-        # 保存失败记录
-        if failed_downloads:
-            failed_df = pd.DataFrame(failed_downloads)
-            failed_file = os.path.join(output_folder, "failed_downloads.csv")
-            failed_df.to_csv(failed_file, index=False, encoding='utf-8')
-            print(f"\n失败记录已保存到: {failed_file}")
+        # 保存失败记录，失败原因取自任务状态（包括混合模式中HTTP下载的失败原因）
+        for record, success in results:
+            if not success:
+                record['error'] = job.entries[job.key(record)]['error']
+        write_failed_records(results, failed_file, ['title', 'pdf_link', 'pdf_filename', 'csv_file', 'error'])
         
         print(f"{'='*80}")
         
     except Exception as e:
         print(f"主处理流程出错: {e}")
         print(traceback.format_exc())
-        
-    finally:
-        # 清理临时下载目录
-        try:
-            import shutil
-            if os.path.exists(download_dir):
-                remaining_files = os.listdir(download_dir)
-                if remaining_files:
-                    print(f"\n临时目录中还有文件: {remaining_files}")
-                    print(f"路径: {download_dir}")
-                else:
-                    shutil.rmtree(download_dir)
-                    print("已清理临时下载目录")
-        except Exception as e:
-            print(f"清理临时目录时出错: {e}")
-        
-        # 关闭浏览器
-        try:
-            driver.quit()
-            print("浏览器已关闭")
-        except Exception as e:
-            print(f"关闭浏览器时出错: {e}")
 
 def main():
     """
@@ -464,14 +243,23 @@ def main():
     print("\n📂 路径配置:")
     input_folder = input("请输入CSV文件夹路径: ").strip().strip('"')
     output_folder = input("PDF输出文件夹 (默认: informs_pdfs): ").strip().strip('"') or "informs_pdfs"
+    workers_input = input("并行浏览器数量 (默认: 1，多个浏览器会各自复制一份Edge配置): ").strip()
+    workers = int(workers_input) if workers_input.isdigit() and int(workers_input) > 0 else 1
+    lean = input("使用精简无头模式? 不显示窗口、不加载图片和字体，需已在Edge中登录 (y/n, 默认n): ").lower().strip() == 'y'
+    hybrid = input("使用混合模式? 浏览器只负责认证，PDF直接并发下载 (y/n, 默认y): ").lower().strip() != 'n'
+    
+    resume, retry_failed = ask_job_mode(output_folder, os.path.join(output_folder, "failed_downloads.csv"))
     
-    if not os.path.exists(input_folder):
+    if not retry_failed and not os.path.exists(input_folder):
         print(f"❌ 错误: 文件夹不存在: {input_folder}")
         return
     
     print(f"\n📋 配置确认:")
     print(f"  输入文件夹: {input_folder}")
     print(f"  输出文件夹: {output_folder}")
+    print(f"  并行浏览器: {workers}")
+    print(f"  精简模式: {'是' if lean else '否'}")
+    print(f"  混合模式: {'是' if hybrid else '否'}")
     
     print(f"\n🎯 功能说明:")
     print(f"  1. 读取CSV文件中的Title和PDF_Link列")
@@ -483,7 +271,8 @@ def main():
     # 确认开始
     if input("\n🚀 确认开始下载? (y/n): ").lower().strip() == 'y':
         print(f"\n🎬 开始处理...")
-        process_csv_files(input_folder, output_folder)
+        process_csv_files(input_folder, output_folder, workers=workers, hybrid=hybrid, lean=lean,
+                          resume=resume, retry_failed=retry_failed)
     else:
         print("❌ 已取消")
 
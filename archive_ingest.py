@@ -0,0 +1,176 @@
+"""
+离线导入：从本地 arXiv 批量PDF压缩包(tar)中按ID提取PDF，不访问网络
+"""
+import json
+import os
+import re
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tqdm import tqdm
+
+from download_from_csv import extract_arxiv_id, load_papers_for_download, paper_file_name
+from pdf_library import PdfLibrary
+
+# 压缩包成员名，例如 2310/2310.12345v1.pdf 或 cs0101001v1.pdf（旧式ID去掉了斜杠）
+MEMBER_PATTERN = re.compile(r'(?:^|/)((?:\d{4}\.\d{4,5})|(?:[a-z\-]+(?:\.[A-Z]{2})?\d{7}))(?:v(\d+))?\.pdf$')
+OLD_STYLE_ID = re.compile(r'^([a-z\-]+(?:\.[A-Z]{2})?)(\d{7})$')
+
+
+def member_arxiv_id(member_name):
+    """从压缩包成员名中解析 (arXiv ID, 版本号)，无法解析时返回 (None, 0)"""
+    match = MEMBER_PATTERN.search(member_name)
+    if not match:
+        return None, 0
+    arxiv_id = match.group(1)
+    old_style = OLD_STYLE_ID.match(arxiv_id)
+    if old_style:
+        arxiv_id = f"{old_style.group(1)}/{old_style.group(2)}"
+    return arxiv_id, int(match.group(2) or 0)
+
+
+def index_archive(archive_path):
+    """
+    扫描一个未压缩的tar包，返回 {arXiv ID: [数据偏移, 大小, 成员名, 版本号]}。
+    同一ID存在多个版本时保留最新版本。
+    """
+    entries = {}
+    with tarfile.open(archive_path, 'r:') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            arxiv_id, version = member_arxiv_id(member.name)
+            if arxiv_id is None:
+                continue
+            if arxiv_id not in entries or version > entries[arxiv_id][3]:
+                entries[arxiv_id] = [member.offset_data, member.size, member.name, version]
+    return entries
+
+
+def load_archive_index(archive_paths, index_path="archive_index.json"):
+    """
+    构建并缓存多个压缩包的成员偏移索引。
+    缓存按压缩包路径、大小和修改时间校验，未变化的压缩包不会重新扫描。
+    返回 {arXiv ID: (压缩包路径, 数据偏移, 大小)}。
+    """
+    cache = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except Exception as e:
+            print(f"读取索引缓存 '{index_path}' 时发生错误: {e}. 将重新建立索引。")
+            cache = {}
+
+    changed = False
+    for archive_path in archive_paths:
+        key = os.path.abspath(archive_path)
+        try:
+            stat = os.stat(archive_path)
+        except FileNotFoundError:
+            print(f"警告：压缩包不存在，已跳过: {archive_path}")
+            continue
+        cached = cache.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            continue
+        try:
+            entries = index_archive(archive_path)
+        except (tarfile.TarError, OSError) as e:
+            print(f"警告：无法建立索引(仅支持未压缩的tar包) '{archive_path}': {e}")
+            continue
+        cache[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'entries': entries}
+        changed = True
+        print(f"已索引压缩包: {os.path.basename(archive_path)} ({len(entries)} 篇)")
+
+    if changed:
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, index_path)
+
+    index = {}
+    requested = {os.path.abspath(p) for p in archive_paths}
+    for key, archive in cache.items():
+        if key not in requested:
+            continue
+        for arxiv_id, (offset, size, _, version) in archive['entries'].items():
+            if arxiv_id not in index or version > index[arxiv_id][3]:
+                index[arxiv_id] = (key, offset, size, version)
+    return {arxiv_id: entry[:3] for arxiv_id, entry in index.items()}
+
+
+def extract_member(archive_path, offset, size, target_path, chunk_size=1024 * 1024):
+    """直接按偏移读取成员数据写入目标文件，不扫描整个压缩包"""
+    tmp_path = f"{target_path}.part"
+    with open(archive_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        src.seek(offset)
+        remaining = size
+        while remaining > 0:
+            chunk = src.read(min(chunk_size, remaining))
+            if not chunk:
+                raise IOError(f"压缩包数据不完整: {archive_path}")
+            dst.write(chunk)
+            remaining -= len(chunk)
+    os.replace(tmp_path, target_path)
+
+
+def papers_archive_core(path_of_csv, archive_paths, max_workers=4, start_from_no=None, specific_nos_list=None,
+                        index_path="archive_index.json", download_base_dir="downloaded_pdfs"):
+    """
+    从本地压缩包中提取目录中选中的论文，文件命名与 papers_file_core 一致: no_year_title.pdf
+    """
+    df = load_papers_for_download(path_of_csv, start_from_no, specific_nos_list)
+    if df is None:
+        return
+
+    index = load_archive_index(archive_paths, index_path)
+    print(f"索引中共有 {len(index)} 篇论文。")
+
+    library = PdfLibrary(download_base_dir)
+    tasks = []
+    not_in_archive = []
+    skipped = 0
+    for _, row in df[df['title'].notna()].iterrows():
+        arxiv_id = extract_arxiv_id(row['pdf_link'])
+        entry = index.get(arxiv_id)
+        if entry is None:
+            not_in_archive.append(row['no'])
+            continue
+        target_path = Path(library.path_for(paper_file_name(row)))
+        if target_path.exists():
+            skipped += 1
+            continue
+        tasks.append((entry, target_path))
+
+    print(f"待提取 {len(tasks)} 篇，已存在 {skipped} 篇，压缩包中未找到 {len(not_in_archive)} 篇。")
+
+    failed = []
+    lock = threading.Lock()
+
+    def extract(task):
+        (archive_path, offset, size), target_path = task
+        try:
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            extract_member(archive_path, offset, size, target_path)
+            library.record(target_path.name)
+        except Exception as e:
+            with lock:
+                failed.append(f"提取失败: {target_path.name}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(tqdm(executor.map(extract, tasks), desc="提取论文中", ncols=100, total=len(tasks)))
+
+    for message in failed:
+        print(message)
+    if not_in_archive:
+        print(f"压缩包中未找到的编号(可交给 papers_file_core 在线下载)，例如：{not_in_archive[:10]}")
+    print(f"\n离线提取完成！成功 {len(tasks) - len(failed)} 篇。")
+    return not_in_archive
+
+
+if __name__ == '__main__':
+    # 示例：从本地 arXiv 批量压缩包中提取 paper_result_no.csv 中的论文
+    archives = sorted(str(p) for p in Path("arxiv_bulk").glob("*.tar"))
+    papers_archive_core(path_of_csv="paper_result_no.csv", archive_paths=archives, max_workers=4)
@@ -0,0 +1,482 @@
+"""
+浏览器下载完成检测：文件一落盘就交给调用方，不再每3秒列一次下载目录
+
+检测来源（同时启用，先到先得）:
+- 文件系统事件: Linux 上用 inotify 监听下载目录的 IN_CLOSE_WRITE / IN_MOVED_TO
+  （Edge/Chrome 下载完成时把 .crdownload 重命名为最终文件名）
+- 浏览器下载事件: 驱动开启了性能日志 (ms:loggingPrefs / goog:loggingPrefs) 时，
+  读取 DevTools 的 Page/Browser.downloadWillBegin 与 downloadProgress(completed) 事件
+- 两者都不可用时（如 Windows 且未开启性能日志）退回目录轮询
+
+TaskDownloadDir 为每次下载尝试分配独立的下载目录，下载结果可以准确对应到论文。
+wait_for_page_ready / wait_for_clickable 用 WebDriverWait 条件代替固定的 time.sleep，
+WaitStats 统计各阶段实际等待时间与原固定等待的差值。
+SelectorCache 按站点和页面模板记录找到按钮的选择器并持久化，下次优先尝试；
+没有命中时用一次 JavaScript 调用检查全部选择器，每轮查找只需一到两次 WebDriver 往返。
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+TEMP_SUFFIXES = ('.crdownload', '.tmp', '.partial', '.download')
+DEFAULT_SELECTOR_CACHE = "selector_cache.json"
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct('iIII')
+
+PERFORMANCE_LOGGING_CAPABILITIES = ('ms:loggingPrefs', 'goog:loggingPrefs')
+
+
+def is_finished_pdf(name):
+    return name.lower().endswith('.pdf') and not name.lower().endswith(TEMP_SUFFIXES)
+
+
+def enable_download_events(options):
+    """为 Edge/Chrome 的 Options 开启性能日志，使 DownloadWatcher 能收到 DevTools 下载事件"""
+    for capability in PERFORMANCE_LOGGING_CAPABILITIES:
+        options.set_capability(capability, {'performance': 'ALL'})
+
+
+class _Inotify:
+    """基于 ctypes 的最小 inotify 封装，只监听一个目录"""
+
+    def __init__(self, directory, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"无法监听目录: {directory}")
+
+    def read(self, timeout):
+        """等待至多 timeout 秒，返回期间完成写入/移入的文件名列表"""
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DownloadWatcher:
+    """
+    在点击下载按钮之前创建，wait() 返回本次新下载完成的 PDF 文件名（相对 download_dir）。
+    driver 开启了性能日志（见 enable_download_events）时同时使用 DevTools 下载事件。
+
+        with DownloadWatcher(download_dir, driver) as watcher:
+            button.click()
+            downloaded_file = watcher.wait(timeout=180)
+    """
+
+    def __init__(self, download_dir, driver=None, poll_interval=3, ignore_existing=True):
+        self.download_dir = download_dir
+        self.driver = driver
+        self.poll_interval = poll_interval
+        os.makedirs(download_dir, exist_ok=True)
+
+        self._inotify = None
+        try:
+            self._inotify = _Inotify(download_dir)
+        except (OSError, AttributeError, TypeError):
+            pass
+
+        self._download_names = {}
+        self._use_devtools = False
+        if driver is not None:
+            try:
+                driver.get_log('performance')  # 丢弃创建之前的事件
+                self._use_devtools = True
+            except Exception:
+                pass
+
+        # ignore_existing=False 时，目录中已有的 PDF 也视为本次下载（调用方已清理过下载目录）
+        self.baseline = self._finished_files() if ignore_existing else set()
+
+    @property
+    def mode(self):
+        sources = [name for name, enabled in (('inotify', self._inotify is not None),
+                                              ('devtools', self._use_devtools)) if enabled]
+        return '+'.join(sources) or 'polling'
+
+    def _finished_files(self):
+        with os.scandir(self.download_dir) as entries:
+            return {entry.name for entry in entries if is_finished_pdf(entry.name) and entry.is_file()}
+
+    def _ready(self, name):
+        if name in self.baseline or not is_finished_pdf(name):
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.download_dir, name)) > 0
+        except OSError:
+            return False
+
+    def _devtools_completed(self):
+        """读取 DevTools 下载事件，返回已完成下载的文件名"""
+        completed = []
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            self._use_devtools = False
+            return completed
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method', '')
+            params = message.get('params', {})
+            if method.endswith('.downloadWillBegin'):
+                self._download_names[params.get('guid')] = params.get('suggestedFilename')
+            elif method.endswith('.downloadProgress') and params.get('state') == 'completed':
+                name = self._download_names.get(params.get('guid'))
+                if name:
+                    completed.append(name)
+        return completed
+
+    def wait(self, timeout=180):
+        """等待新的 PDF 下载完成，返回文件名；超时返回 None"""
+        start_time = time.time()
+        last_status_time = start_time
+
+        # 监听建立之前就已完成的下载
+        candidates = self._finished_files()
+        while time.time() - start_time < timeout:
+            for name in candidates:
+                if self._ready(name):
+                    print(f"  下载完成 ({self.mode}, {time.time() - start_time:.1f}s): {name}")
+                    return name
+
+            remaining = timeout - (time.time() - start_time)
+            if self._inotify is not None:
+                candidates = self._inotify.read(min(remaining, 0.5 if self._use_devtools else 5))
+            elif self._use_devtools:
+                time.sleep(min(remaining, 0.5))
+                candidates = []
+            else:
+                time.sleep(min(remaining, self.poll_interval))
+                candidates = self._finished_files()
+            if self._use_devtools:
+                candidates = list(candidates) + self._devtools_completed()
+            if time.time() - last_status_time >= 30:
+                # 事件可能丢失（如下载目录位于网络文件系统），定期补查一次
+                candidates = list(candidates) + list(self._finished_files())
+                print(f"  [{int(time.time() - start_time)}s] 等待下载完成... ({self.mode})")
+                last_status_time = time.time()
+
+        print(f"  下载等待超时({timeout}秒)")
+        return None
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def set_download_dir(driver, download_dir):
+    """用 DevTools 命令让浏览器把之后的下载保存到 download_dir，返回是否成功"""
+    path = os.path.abspath(download_dir)
+    commands = (('Browser.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': path, 'eventsEnabled': True}),
+                ('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': path}))
+    for command, params in commands:
+        try:
+            driver.execute_cdp_cmd(command, params)
+            return True
+        except Exception:
+            continue
+    return False
+
+
+class TaskDownloadDir:
+    """
+    为一次下载尝试分配独立的下载目录 (base_dir/task_<编号>)，并通过 DevTools 命令让浏览器下载到这里。
+    目录中出现的PDF只可能属于这次尝试；结束时删除目录，迟到的文件不会被算到下一篇论文上，
+    同一浏览器的下载也可以重叠进行。
+    浏览器不支持该命令时退回共享的 base_dir，并像原来一样先清理其中的旧文件。
+    """
+
+    def __init__(self, driver, base_dir):
+        self.base_dir = base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix='task_', dir=base_dir)
+        self.isolated = set_download_dir(driver, self.path)
+        if not self.isolated:
+            os.rmdir(self.path)
+            self.path = base_dir
+            cleaned_files = []
+            with os.scandir(base_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(('.pdf',) + TEMP_SUFFIXES):
+                        try:
+                            os.remove(entry.path)
+                            cleaned_files.append(entry.name)
+                        except OSError as e:
+                            print(f"清理文件失败: {e}")
+            if cleaned_files:
+                print(f"清理旧文件: {cleaned_files}")
+
+    def close(self):
+        if self.isolated:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def wait_for_page_ready(driver, timeout=30, poll_frequency=0.25):
+    """
+    等待 document.readyState 为 complete，返回是否在 timeout 内就绪；
+    页面加载策略为 eager 时 DOM 可交互 (interactive) 即可，不等图片等子资源
+    """
+    eager = (getattr(driver, 'capabilities', None) or {}).get('pageLoadStrategy') == 'eager'
+    ready_states = ('interactive', 'complete') if eager else ('complete',)
+    try:
+        WebDriverWait(driver, timeout, poll_frequency).until(
+            lambda d: d.execute_script("return document.readyState") in ready_states)
+        return True
+    except TimeoutException:
+        return False
+
+
+def page_memory_mb(driver):
+    """当前页面已用的 JS 堆内存 (MB)，浏览器不支持时返回 None"""
+    try:
+        used = driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : null")
+        return used / 2**20 if used else None
+    except Exception:
+        return None
+
+
+def page_template(url):
+    """页面模板：主机名 + 路径前三段，含数字的路径段（文章编号、DOI 等）替换为 *"""
+    parts = urlsplit(url)
+    segments = [('*' if re.search(r'\d', segment) else segment) for segment in parts.path.split('/') if segment]
+    return parts.netloc.lower() + '/' + '/'.join(segments[:3])
+
+
+class SelectorCache:
+    """
+    记录每个 (页面模板, 按钮) 上各选择器成功的次数，保存在 JSON 文件中（线程安全）。
+    ordered() 把成功次数多的选择器排在前面。
+    """
+
+    def __init__(self, path=DEFAULT_SELECTOR_CACHE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._hits = json.load(f)
+        except (OSError, ValueError):
+            self._hits = {}
+
+    def ordered(self, key, selectors):
+        hits = self._hits.get(key, {})
+        return sorted(selectors, key=lambda selector: -hits.get(selector, 0))
+
+    def best(self, key, selectors):
+        """成功次数最多且仍在 selectors 中的选择器，没有记录时返回 None"""
+        hits = self._hits.get(key, {})
+        learned = [selector for selector in selectors if hits.get(selector)]
+        return max(learned, key=hits.get) if learned else None
+
+    def record(self, key, selector):
+        with self._lock:
+            hits = self._hits.setdefault(key, {})
+            hits[selector] = hits.get(selector, 0) + 1
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._hits, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+# 一次调用检查全部选择器，返回第一个可见且可用的 [元素, 选择器]
+_FIND_CLICKABLE_JS = """
+const selectors = arguments[0];
+for (const selector of selectors) {
+    let elements = [];
+    try {
+        if (selector.startsWith('//')) {
+            const result = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let i = 0; i < result.snapshotLength; i++) elements.push(result.snapshotItem(i));
+        } else {
+            elements = document.querySelectorAll(selector);
+        }
+    } catch (e) {
+        continue;
+    }
+    for (const element of elements) {
+        const visible = element.getClientRects().length > 0 && getComputedStyle(element).visibility !== 'hidden';
+        if (visible && !element.disabled) return [element, selector];
+    }
+}
+return null;
+"""
+
+
+def _find_clickable_one_by_one(driver, selectors):
+    for selector in selectors:
+        by = By.XPATH if selector.startswith('//') else By.CSS_SELECTOR
+        try:
+            elements = driver.find_elements(by, selector)
+        except Exception:
+            continue
+        for element in elements:
+            try:
+                if element.is_displayed() and element.is_enabled():
+                    return element, selector
+            except Exception:
+                continue
+    return False
+
+
+def find_clickable(driver, selectors, preferred=None):
+    """
+    返回第一个可见且可用的 (元素, 选择器)，都没有时返回 False。
+    先单独尝试 preferred（学习到的选择器），再用一次 JavaScript 调用按顺序检查全部选择器
+    （'//' 开头的按 XPath）；脚本无法执行时退回逐个 find_elements。
+    """
+    if preferred:
+        found = _find_clickable_one_by_one(driver, [preferred])
+        if found:
+            return found
+    try:
+        found = driver.execute_script(_FIND_CLICKABLE_JS, list(selectors))
+    except Exception:
+        return _find_clickable_one_by_one(driver, selectors)
+    return tuple(found) if found else False
+
+
+def wait_for_clickable(driver, selectors, timeout, poll_frequency=0.5, cache=None, name='button'):
+    """
+    等待任一选择器出现可点击的元素，返回 (元素, 选择器)；超时返回 (None, None)。
+    cache 为 SelectorCache 时按当前页面模板和 name 优先尝试以前成功的选择器，并记录本次结果。
+    """
+    key = preferred = None
+    if cache is not None:
+        key = f"{page_template(driver.current_url)}#{name}"
+        selectors = cache.ordered(key, selectors)
+        preferred = cache.best(key, selectors)
+    try:
+        element, selector = WebDriverWait(driver, timeout, poll_frequency).until(
+            lambda d: find_clickable(d, selectors, preferred))
+    except TimeoutException:
+        return None, None
+    if cache is not None:
+        cache.record(key, selector)
+    return element, selector
+
+
+def click_element(driver, element, timeout=5):
+    """滚动到元素并在其可点击时点击；被遮挡时退回 JavaScript 点击"""
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+    try:
+        WebDriverWait(driver, timeout, 0.1).until(EC.element_to_be_clickable(element)).click()
+    except Exception:
+        driver.execute_script("arguments[0].click();", element)
+
+
+class WaitStats:
+    """
+    记录每篇论文各等待阶段的实际用时（线程安全），与原流程中固定 sleep 的秒数对比，
+    估算每篇论文节省的时间。
+    """
+
+    def __init__(self, fixed_sleeps):
+        self.fixed_sleeps = dict(fixed_sleeps)
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._counts = {}
+        self._memory = []
+        self.papers = 0
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self._totals[phase] = self._totals.get(phase, 0.0) + seconds
+            self._counts[phase] = self._counts.get(phase, 0) + 1
+
+    def record_memory(self, megabytes):
+        """记录页面加载后的 JS 堆内存 (MB)，None 表示无法获取"""
+        if megabytes is not None:
+            with self._lock:
+                self._memory.append(megabytes)
+
+    def paper_done(self):
+        with self._lock:
+            self.papers += 1
+
+    def print_summary(self):
+        if not self.papers:
+            return
+        print("\n⏱️  等待时间统计（每篇平均）:")
+        saved = 0.0
+        for phase, total in self._totals.items():
+            average = total / self._counts[phase]
+            fixed = self.fixed_sleeps.get(phase)
+            if fixed is None:
+                print(f"  {phase}: {average:.1f}s")
+            else:
+                saved += (fixed - average) * self._counts[phase] / self.papers
+                print(f"  {phase}: {average:.1f}s (原固定等待 {fixed}s)")
+        print(f"  估计每篇节省: {saved:.1f}s，共 {self.papers} 篇")
+        if self._memory:
+            print(f"  页面JS堆内存: 平均 {sum(self._memory) / len(self._memory):.1f}MB，最大 {max(self._memory):.1f}MB")
+
+
+def timed(stats, phase):
+    """计时上下文，用法: with timed(stats, 'page_load'): ...；stats 为 None 时不记录"""
+    return _PhaseTimer(stats, phase)
+
+
+class _PhaseTimer:
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            self.stats.record(self.phase, time.perf_counter() - self.start)
@@ -0,0 +1,101 @@
+"""
+多个浏览器并行下载时的配置与节流（工作线程的调度见 scheduler.DownloadScheduler）
+
+- 配置副本：同一个用户配置不能被多个浏览器同时打开，每个工作浏览器使用自己的副本和下载目录
+- 全局节流：所有工作者合计，相邻两次任务开始之间至少间隔 min_interval 秒，
+  吞吐量随工作者数量增加，但对站点的请求频率不超过机构允许的上限
+- 精简模式：无头浏览器 + 只含登录 Cookie 的最小配置 + 屏蔽图片/字体/媒体/统计脚本，页面加载策略为 eager
+"""
+import os
+import shutil
+import threading
+import time
+
+DEFAULT_PROFILE_ROOT = "browser_profiles"
+# 复制用户配置时跳过的缓存目录（体积大且与登录状态无关）
+PROFILE_SKIP_PATTERNS = ('Cache', 'Code Cache', 'GPUCache', 'DawnCache', 'GrShaderCache', 'ShaderCache',
+                         'Service Worker', 'Crashpad', '*.log', 'LOCK', 'SingletonLock')
+# 精简配置只保留登录状态：Cookie 数据库（新版在 Network/ 下）
+AUTH_PROFILE_FILES = ('Network/Cookies', 'Network/Cookies-journal', 'Cookies', 'Cookies-journal')
+# 精简模式下屏蔽的请求（图片、字体、音视频、统计脚本），不影响页面结构和PDF下载
+BLOCKED_URL_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+                        '*.mp4', '*.webm', '*.mp3',
+                        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+                        '*hotjar.com*', '*newrelic.com*', '*nr-data.net*']
+
+
+def copy_browser_profile(user_data_dir, worker_id, profile='Default', profile_root=DEFAULT_PROFILE_ROOT):
+    """
+    为工作浏览器复制一份用户配置（保留 Cookie 等登录状态，跳过缓存），已复制过则直接复用。
+    同一个用户配置不能被多个浏览器同时打开，所以每个工作浏览器需要自己的副本。
+    返回副本的 user-data-dir。
+    """
+    target = os.path.abspath(os.path.join(profile_root, f"worker_{worker_id}"))
+    if not os.path.exists(os.path.join(target, profile)):
+        print(f"复制浏览器配置到: {target}")
+        shutil.copytree(os.path.join(user_data_dir, profile), os.path.join(target, profile),
+                        ignore=shutil.ignore_patterns(*PROFILE_SKIP_PATTERNS), dirs_exist_ok=True)
+        # Local State 中保存了 Cookie 的解密密钥
+        local_state = os.path.join(user_data_dir, 'Local State')
+        if os.path.exists(local_state):
+            shutil.copy2(local_state, os.path.join(target, 'Local State'))
+    return target
+
+
+def copy_auth_profile(user_data_dir, name, profile='Default', profile_root=DEFAULT_PROFILE_ROOT):
+    """
+    复制只含登录 Cookie 的最小配置（精简模式使用），每次启动都刷新 Cookie；
+    原配置正被占用无法复制时沿用上次的副本。返回副本的 user-data-dir。
+    """
+    target = os.path.abspath(os.path.join(profile_root, name))
+    for rel_path in AUTH_PROFILE_FILES + ('../Local State',):
+        source = os.path.normpath(os.path.join(user_data_dir, profile, rel_path))
+        if not os.path.exists(source):
+            continue
+        destination = os.path.normpath(os.path.join(target, profile, rel_path))
+        try:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(source, destination)
+        except OSError as e:
+            print(f"复制 {rel_path} 失败，沿用已有副本: {e}")
+    return target
+
+
+def apply_lean_options(options):
+    """精简模式的启动参数：无头、不加载图片、静音，页面加载策略为 eager（DOM 就绪即返回）"""
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,1024")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--mute-audio")
+    options.add_argument("--disable-background-networking")
+    options.page_load_strategy = 'eager'
+    return options
+
+
+def block_heavy_requests(driver):
+    """通过 DevTools 屏蔽图片、字体、媒体和统计脚本的请求，返回是否生效"""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        return True
+    except Exception as e:
+        print(f"无法屏蔽资源请求: {e}")
+        return False
+
+
+class PacingLimiter:
+    """全局节流：任意两次 wait() 返回之间至少间隔 min_interval 秒（线程安全）"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,133 @@
+"""
+混合下载：浏览器只负责机构认证，PDF 由 HTTP 连接池直接下载
+
+- 浏览器登录后的 Cookie 和 User-Agent 复制到 requests.Session（连接池大小与并发数一致），
+  调度器的多个工作线程共用该会话流式下载，不再为每篇论文加载页面、点击按钮、监听下载目录
+- 响应不是 PDF（401/403，或会话过期被重定向到登录页）时，由浏览器重新打开该链接完成认证，
+  刷新 Cookie 后重试一次；仍失败的记录交回原来的浏览器流程
+- 并发数和请求间隔由 scheduler.DownloadScheduler 控制（见 INFORMS_getpdf.InformsHybridProvider）
+"""
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from browser_download import wait_for_page_ready
+
+CHUNK_SIZE = 256 * 1024
+
+
+class SessionExpired(Exception):
+    """服务器没有返回 PDF，通常是登录状态失效"""
+
+
+def copy_browser_cookies(driver, session):
+    """把浏览器当前的 Cookie 和 User-Agent 复制到 requests 会话"""
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie['name'], cookie['value'],
+                            domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+
+
+def session_from_driver(driver, pool_size=4):
+    """创建带连接池的会话，并带上浏览器的登录状态"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept'] = 'application/pdf,*/*;q=0.8'
+    copy_browser_cookies(driver, session)
+    return session
+
+
+def stream_pdf(session, url, output_path, timeout=60):
+    """
+    流式下载 PDF 到 output_path（先写 .part 文件，完成后改名），返回字节数。
+    响应不是 PDF 时抛出 SessionExpired，网络错误抛出 requests 的异常。
+    """
+    with session.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code in (401, 403):
+            raise SessionExpired(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        chunks = response.iter_content(CHUNK_SIZE)
+        first = next(chunks, b'')
+        if not first.startswith(b'%PDF'):
+            raise SessionExpired(f"返回的不是PDF ({response.headers.get('Content-Type', '未知类型')})")
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        part_path = f"{output_path}.part"
+        with open(part_path, 'wb') as f:
+            f.write(first)
+            size = len(first)
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(part_path, output_path)
+        return size
+
+
+class HybridDownloader:
+    """
+    driver 为已启动的浏览器（只在重新认证时使用，同一时间只有一个线程操作它）；
+    resolve_url(url) 把记录中的链接转换为可直接下载的 PDF 地址。
+    """
+
+    def __init__(self, driver, pool_size=4, resolve_url=None, page_timeout=30):
+        self.driver = driver
+        self.resolve_url = resolve_url or (lambda url: url)
+        self.page_timeout = page_timeout
+        self.session = session_from_driver(driver, pool_size)
+        self._auth_lock = threading.Lock()
+        self._generation = 0
+        self.reauth_count = 0
+
+    def authenticate(self, url):
+        """用浏览器打开 url 完成机构认证，然后刷新会话的 Cookie"""
+        self.driver.get(url)
+        wait_for_page_ready(self.driver, self.page_timeout)
+        copy_browser_cookies(self.driver, self.session)
+
+    def _reauthenticate(self, url, generation):
+        with self._auth_lock:
+            # 其他线程已经在这之后重新认证过，直接用新的 Cookie 重试
+            if generation != self._generation:
+                return
+            print("🔑 会话已失效，使用浏览器重新认证...")
+            self.authenticate(url)
+            self._generation += 1
+            self.reauth_count += 1
+
+    def download(self, url, output_path):
+        """下载一篇论文，成功时返回 None，失败时返回失败原因"""
+        pdf_url = self.resolve_url(url)
+        for attempt in range(2):
+            generation = self._generation
+            try:
+                stream_pdf(self.session, pdf_url, output_path)
+                return None
+            except SessionExpired as e:
+                if attempt == 0:
+                    try:
+                        self._reauthenticate(url, generation)
+                    except Exception as auth_error:
+                        print(f"✗ 重新认证失败: {auth_error}")
+                        return f"重新认证失败: {auth_error}"
+                else:
+                    print(f"✗ HTTP下载失败: {e}: {pdf_url}")
+                    return str(e)
+            except requests.exceptions.RequestException as e:
+                print(f"✗ HTTP下载失败: {e}: {pdf_url}")
+                return f"{type(e).__name__}: {e}"
+
+    def close(self):
+        self.session.close()
+
+
+def with_query(url, **params):
+    """在链接上添加（或覆盖）查询参数"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params)
+    return urlunsplit(parts._replace(query=urlencode(query)))
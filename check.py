@@ -1,5 +1,12 @@
+import argparse
 import os
 import re
+import time
+
+import pandas as pd
+
+from keywords_filter import write_missing_manifest
+from pdf_library import PdfLibrary, file_no
 
 def check_file_sequence_optimized(directory_path):
     """
@@ -15,7 +22,12 @@ def check_file_sequence_optimized(directory_path):
     pattern = re.compile(r'^\d+_.*\.pdf$', re.IGNORECASE)
 
     try:
-        for filename in os.listdir(directory_path):
+        if not os.path.isdir(directory_path):
+            raise FileNotFoundError(directory_path)
+        # 扫描目录（含分片子目录，见 pdf_library）列出磁盘上的实际文件；只读，不写索引文件
+        library = PdfLibrary(directory_path, read_only=True)
+        library.rebuild_index()
+        for filename, _, _ in library.entries():
             if pattern.match(filename):
                 try:
                     # 直接获取第一个下划线前的部分并转换为整数
@@ -49,10 +61,89 @@ def check_file_sequence_optimized(directory_path):
     else:
         print("\n所有 'no' 字段都是连贯的！")
 
+def scan_pdf_directory(directory_path, refresh=True):
+    """
+    返回 (by_no, unmatched)：by_no 为 {no: [(文件名, 字节数), ...]}，
+    unmatched 为不符合 'no_year_title.pdf' 格式的 PDF 文件名。
+    refresh=True 时用 os.scandir 扫描一次目录（含分片子目录），以磁盘上的实际文件为准；
+    refresh=False 时直接使用已有的路径索引，不访问目录。只读打开，不写索引文件。
+    """
+    if not os.path.isdir(directory_path):
+        raise FileNotFoundError(directory_path)
+    library = PdfLibrary(directory_path, read_only=True)
+    if refresh:
+        library.rebuild_index()
+
+    by_no = {}
+    unmatched = []
+    for name, _, size in library.entries():
+        no = file_no(name)
+        if no is not None:
+            by_no.setdefault(no, []).append((name, size))
+        else:
+            unmatched.append(name)
+    return by_no, unmatched
+
+
+def load_catalog_nos(catalog_csv):
+    """读取目录CSV中的 'no' 列，返回编号集合"""
+    nos = pd.read_csv(catalog_csv, usecols=['no'], encoding='utf-8')['no']
+    return set(pd.to_numeric(nos, errors='coerce').dropna().astype(int))
+
+
+def reconcile_with_catalog(directory_path, catalog_csv, work_list='missing_nos.txt', refresh=True):
+    """
+    将目录中的 PDF 与目录CSV逐一比对，报告：
+      missing    目录CSV中有、磁盘上没有的编号（包括超出磁盘最大编号的部分）
+      zero_byte  只有0字节文件的编号（下载中断），需要重新下载
+      duplicate  同一编号对应多个文件（如标题变化后重复下载）
+      extra      磁盘上有、目录CSV中没有的文件（含不符合命名格式的 PDF）
+    missing 与 zero_byte 写入 work_list（为 None 时不写），
+    可直接用 papers_file_core(specific_nos_list=work_list) 补下载。
+    目录只扫描一次（refresh=False 时只读路径索引），比对基于集合运算，耗时与文件数量成线性关系。
+    """
+    start = time.perf_counter()
+    try:
+        by_no, unmatched = scan_pdf_directory(directory_path, refresh)
+    except FileNotFoundError:
+        print(f"错误：目录 '{directory_path}' 不存在。")
+        return None
+    catalog_nos = load_catalog_nos(catalog_csv)
+
+    zero_byte = sorted(no for no, files in by_no.items() if all(size == 0 for _, size in files))
+    report = {
+        'missing': sorted(catalog_nos.difference(by_no)),
+        'zero_byte': [no for no in zero_byte if no in catalog_nos],
+        'duplicate': {no: sorted(name for name, _ in files) for no, files in sorted(by_no.items()) if len(files) > 1},
+        'extra': sorted(name for no, files in by_no.items() if no not in catalog_nos for name, _ in files) + sorted(unmatched),
+    }
+
+    print(f"目录CSV共 {len(catalog_nos)} 篇，磁盘上有 {len(by_no)} 个编号，扫描比对用时 {time.perf_counter() - start:.2f}s")
+    print(f"缺失: {len(report['missing'])}，0字节: {len(report['zero_byte'])}，"
+          f"重复: {len(report['duplicate'])}，多余: {len(report['extra'])}")
+    for no, names in list(report['duplicate'].items())[:5]:
+        print(f"  重复编号 {no}: {names}")
+    for name in report['extra'][:5]:
+        print(f"  多余文件: {name}")
+
+    todo = sorted(report['missing'] + report['zero_byte'])
+    if work_list and todo:
+        write_missing_manifest(todo, work_list)
+        print(f"待下载编号已写入 '{work_list}'，可用 papers_file_core(specific_nos_list='{work_list}') 补下载")
+    return report
+
+
 # --- 使用方法 ---
 if __name__ == "__main__":
-    # 将 'your_directory_path' 替换为你的文件所在的实际目录
-    # 例如: r"C:\Users\YourUser\Documents\MyPDFs" 或者 "/home/youruser/pdfs"
-    target_directory = ".\downloaded_pdfs" 
-    missing_numbers = check_file_sequence_optimized(target_directory)
-    print(missing_numbers)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="检查已下载PDF与论文目录是否一致")
+    parser.add_argument('directory', nargs='?', default="downloaded_pdfs", help="PDF 所在目录")
+    parser.add_argument('--catalog', help="论文目录CSV（如 paper_result_no.csv），不指定时只检查编号连续性")
+    parser.add_argument('--work-list', default='missing_nos.txt', help="待下载编号清单的输出路径")
+    parser.add_argument('--use-index', action='store_true', help="直接使用路径索引，不重新扫描目录")
+    args = parser.parse_args()
+
+    if args.catalog:
+        reconcile_with_catalog(args.directory, args.catalog, args.work_list, refresh=not args.use_index)
+    else:
+        missing_numbers = check_file_sequence_optimized(args.directory)
+        print(missing_numbers)
@@ -0,0 +1,103 @@
+"""
+EBSCO / INFORMS 元数据CSV文件夹的批量导入：在启动任何浏览器之前生成精简的待下载列表
+
+- 文件夹（含子文件夹）中的CSV由线程池并发读取，合并为一个 DataFrame（csv_file 列记录来源文件）
+- 标题编码为文件名、coverDate 解析年份都按列向量化处理，不再逐行 apply
+- 按下载链接、规范化标题和文件名跨文件去重，同一条记录只下载一次
+- 是否已下载由 PdfLibrary.existing 按索引判断（并核对磁盘上的文件和大小）
+"""
+import html
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import pandas as pd
+
+from dedup import normalize_title
+from edge_browser import FILENAME_CHAR_MAP, find_csv_files
+
+
+def read_csv_folder(input_folder, prepare=None, max_workers=8):
+    """
+    并发读取 input_folder 及其子文件夹中的所有CSV，返回合并后的 DataFrame（增加 csv_file 列）。
+    prepare(df, csv_file) 在读取线程中检查/补充列，返回 None 时跳过该文件。
+    """
+    csv_files = find_csv_files(input_folder)
+    print(f"\n找到 {len(csv_files)} 个CSV文件")
+
+    def read(csv_file):
+        try:
+            df = pd.read_csv(csv_file, encoding='utf-8')
+            if prepare is not None:
+                df = prepare(df, csv_file)
+            if df is not None:
+                df['csv_file'] = os.path.basename(csv_file)
+            return df
+        except Exception as e:
+            print(f"读取CSV文件时出错 {os.path.basename(csv_file)}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = [df for df in executor.map(read, csv_files) if df is not None]
+
+    if not frames:
+        return pd.DataFrame(columns=['csv_file'])
+    df = pd.concat(frames, ignore_index=True)
+    print(f"读取 {len(frames)} 个文件，共 {len(df)} 条记录")
+    return df
+
+
+def encode_titles(titles, default="", max_length=None):
+    """encode_title_for_filename 的向量化版本，结果与逐行调用相同"""
+    missing = titles.isna()
+    encoded = titles.astype(str).str.strip()
+    # HTML实体和URL编码只出现在少数标题中，只对这些标题逐个解码
+    escaped = ~missing & encoded.str.contains('[&%]', regex=True)
+    if escaped.any():
+        encoded[escaped] = encoded[escaped].map(lambda title: unquote(html.unescape(title)))
+    for char, replacement in FILENAME_CHAR_MAP.items():
+        encoded = encoded.str.replace(char, replacement, regex=False)
+    encoded = encoded.str.replace(r'\s+', ' ', regex=True).str.strip().str.rstrip('.')
+    if max_length is not None:
+        encoded = encoded.str.slice(0, max_length)
+    return encoded.mask(missing, default)
+
+
+def cover_years(dates):
+    """
+    从 EBSCO 的 coverDate 列解析出版年份：Mar2016、20160301、2021-05-01 等格式中
+    第一个连续的四位数字即为年份，没有年份时为 NaN
+    """
+    return pd.to_numeric(dates.astype('string').str.extract(r'(\d{4})', expand=False), errors='coerce')
+
+
+def build_work_list(df, library, link_column, title_column, skip_titles=None):
+    """
+    df 需包含 link_column、title_column 和 pdf_filename 列。
+    去掉无效链接/文件名、近似重复记录（skip_titles，规范化标题集合），按链接、规范化标题、文件名去重，
+    再去掉库中已有的文件，返回剩余的行。
+    """
+    total = len(df)
+    links = df[link_column].astype('string').str.strip()
+    df = df[links.notna() & (links != '') & (df['pdf_filename'] != '.pdf')]
+    invalid = total - len(df)
+
+    normalized = df[title_column].map(normalize_title)
+
+    near_duplicates = 0
+    if skip_titles:
+        is_skipped = normalized.isin(skip_titles)
+        near_duplicates = int(is_skipped.sum())
+        df, normalized = df[~is_skipped], normalized[~is_skipped]
+
+    # 规范化标题为空时不参与按标题去重
+    repeated = df[link_column].duplicated() | df['pdf_filename'].duplicated()
+    repeated |= normalized.duplicated() & (normalized != '')
+    df = df[~repeated]
+
+    existing = df['pdf_filename'].isin(library.existing(df['pdf_filename']))
+    df = df[~existing]
+
+    print(f"无效记录 {invalid} 条，近似重复 {near_duplicates} 条，跨文件重复 {int(repeated.sum())} 条，"
+          f"已下载 {int(existing.sum())} 条；待下载 {len(df)} 条")
+    return df
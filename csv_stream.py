@@ -0,0 +1,52 @@
+"""
+分块流式处理CSV：按固定行数读取，逐块写出结果，峰值内存与文件大小无关
+"""
+import os
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def stream_csv(input_csv, output_csv, process_chunk, chunksize=DEFAULT_CHUNKSIZE, encoding='utf-8'):
+    """
+    逐块读取 input_csv，对每块调用 process_chunk(chunk, offset)，将返回的 DataFrame 追加写入 output_csv。
+    offset 为该块第一行在整个文件中的行号（从0开始）。
+    先写入临时文件，全部完成后再替换 output_csv，中途失败不会留下半个结果。
+    返回写出的总行数。
+    """
+    tmp_path = f"{output_csv}.tmp"
+    written = 0
+    offset = 0
+    header_written = False
+    try:
+        with open(tmp_path, 'w', newline='', encoding=encoding) as out:
+            for chunk in pd.read_csv(input_csv, encoding=encoding, chunksize=chunksize):
+                result = process_chunk(chunk, offset)
+                offset += len(chunk)
+                if result is None:
+                    continue
+                # 即使没有匹配行也写出表头，保证输出文件的列与输入一致
+                if len(result) or not header_written:
+                    result.to_csv(out, index=False, header=not header_written)
+                    header_written = True
+                written += len(result)
+        os.replace(tmp_path, output_csv)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+
+def stream_filter_csv(input_csv, output_csv, predicate, chunksize=DEFAULT_CHUNKSIZE, prepare=None, encoding='utf-8'):
+    """
+    分块筛选：predicate(chunk) 返回布尔掩码，匹配的行追加写入 output_csv。
+    prepare(chunk) 可选，在筛选前对块做预处理（如小写化）。
+    返回写出的总行数。
+    """
+    def process_chunk(chunk, offset):
+        if prepare is not None:
+            chunk = prepare(chunk)
+        return chunk[predicate(chunk)]
+
+    return stream_csv(input_csv, output_csv, process_chunk, chunksize, encoding)
@@ -0,0 +1,277 @@
+"""
+近似重复论文检测：MinHash 签名 + LSH 分桶
+
+同一工作经常以多个 arXiv 条目出现，或再次出现在 EBSCO / INFORMS 的CSV中，标题只有细微差别。
+本模块对 title + abstract 计算 MinHash 签名，按 LSH 分桶找候选对，只比较同桶记录，
+在 10 万级记录上是次二次复杂度。结果输出为重复簇，下载阶段可跳过簇中的非规范成员。
+
+用法:
+    uv run dedup.py
+"""
+import os
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from download_from_csv import extract_arxiv_id
+
+MAX_HASH = (1 << 32) - 1
+DEFAULT_DUPLICATES_CSV = "duplicate_clusters.csv"
+# 规范成员的来源优先级：arXiv 可以直接HTTP下载，优先保留
+SOURCE_PRIORITY = {'arxiv': 0, 'informs': 1, 'ebsco': 2}
+
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+WORD = re.compile(r'[0-9a-z]+')
+
+
+def normalize_text(text):
+    """小写并去掉标点，统一空白"""
+    if not isinstance(text, str):
+        return ''
+    return NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def normalize_title(title):
+    """用于跨来源比较标题的规范形式"""
+    return normalize_text(title)
+
+
+def shingle_hashes(texts, k=3):
+    """
+    将所有文本切分为 k 个连续词的 shingle 并哈希为 64 位整数，全程向量化。
+    返回 (shingle哈希数组, 每个shingle所属的文本行号)；不足 k 个词的文本以单词作为 shingle。
+    词先用 crc32 映射（跨进程稳定，且每个不同的词只算一次），再按位置组合成 shingle 哈希。
+    """
+    words = pd.Series(texts, dtype=object).fillna('').str.lower().str.findall(WORD)
+    lengths = words.str.len().to_numpy()
+    exploded = words.explode().dropna()
+    if exploded.empty:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+    codes, vocabulary = pd.factorize(exploded)
+    vocabulary_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in vocabulary),
+                                    dtype=np.uint64, count=len(vocabulary))
+    word_hashes = vocabulary_hashes[codes]
+    owners = exploded.index.to_numpy()
+
+    # 第 i 个 shingle 由位置 i..i+k-1 的词组成，要求这些词属于同一行
+    if len(word_hashes) >= k:
+        combined = np.zeros(len(word_hashes) - k + 1, dtype=np.uint64)
+        for offset in range(k):
+            combined = combined * np.uint64(0x100000001B3) + word_hashes[offset:len(word_hashes) - k + 1 + offset]
+        same_row = owners[:len(combined)] == owners[k - 1:]
+        hashes, hash_owners = combined[same_row], owners[:len(combined)][same_row]
+    else:
+        hashes, hash_owners = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+    short = np.isin(owners, np.flatnonzero(lengths < k))
+    hashes = np.concatenate([hashes, word_hashes[short]])
+    hash_owners = np.concatenate([hash_owners, owners[short]])
+    order = np.argsort(hash_owners, kind='stable')
+    return hashes[order], hash_owners[order]
+
+
+def minhash_signatures(texts, num_perm=128, k=3, seed=1):
+    """
+    计算所有文本的 MinHash 签名，返回 (n, num_perm) 的 uint32 矩阵；没有任何 shingle 的文本整行为 MAX_HASH。
+
+    采用单次置换 MinHash (one permutation hashing)：每个 shingle 只哈希一次，
+    按哈希值分入 num_perm 个桶，每个桶取最小值；空桶从右侧最近的非空桶借值（循环），
+    相同位置取值相等的概率仍等于 Jaccard 相似度，但只需对全部 shingle 做一次运算，
+    而不是 num_perm 次。
+    """
+    hashes, owners = shingle_hashes(texts, k)
+    signatures = np.full((len(texts), num_perm), MAX_HASH, dtype=np.uint32)
+    if len(hashes) == 0:
+        return signatures
+
+    # 两个 multiply-shift 哈希：高32位分别作为桶号和桶内取值
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=2, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=2, dtype=np.uint64, endpoint=True)
+    shift = np.uint64(32)
+    with np.errstate(over='ignore'):
+        bins = ((a[0] * hashes + b[0]) >> shift) % np.uint64(num_perm)
+        values = ((a[1] * hashes + b[1]) >> shift).astype(np.uint32)
+
+    # 每个 (行, 桶) 的最小值：把 (行*桶数+桶号, 取值) 压成一个 uint64 排序，每个键的第一个即最小值
+    keys = owners.astype(np.uint64) * np.uint64(num_perm) + bins
+    packed = np.sort((keys << shift) | values.astype(np.uint64))
+    keys = packed >> shift
+    first = np.concatenate(([True], keys[1:] != keys[:-1]))
+    flat = signatures.reshape(-1)
+    flat[keys[first].astype(np.int64)] = (packed[first] & np.uint64(MAX_HASH)).astype(np.uint32)
+
+    # 空桶致密化：从右侧最近的非空桶借值，末尾的空桶从行首循环借值（扫描两圈）
+    has_any = np.zeros(len(texts), dtype=bool)
+    has_any[owners] = True
+    dense = signatures[has_any]
+    empty = np.zeros(len(dense), dtype=bool)
+    borrowed = np.full(len(dense), MAX_HASH, dtype=np.uint32)
+    for column in list(range(num_perm - 1, -1, -1)) * 2:
+        empty = dense[:, column] == MAX_HASH
+        dense[empty, column] = borrowed[empty]
+        borrowed = np.where(dense[:, column] != MAX_HASH, dense[:, column], borrowed)
+    signatures[has_any] = dense
+    return signatures
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def find_duplicate_clusters(signatures, bands=16, threshold=0.8, max_bucket_pairs=50):
+    """
+    LSH 分桶：签名切成 bands 段，任一段完全相同的记录成为候选对，
+    再用签名估计的 Jaccard 相似度 >= threshold 确认。返回重复簇（行号列表，至少两个成员）。
+    每段先向量化地算出段哈希并排序，只遍历成员数 >= 2 的桶；
+    较大的桶只与桶内第一个成员比较，避免退化为二次复杂度。
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    valid_rows = np.flatnonzero(signatures[:, 0] != MAX_HASH)
+    uf = _UnionFind(n)
+
+    def similar(i, j):
+        return np.mean(signatures[i] == signatures[j]) >= threshold
+
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            band_hash = np.zeros(len(valid_rows), dtype=np.uint64)
+            for column in range(band * rows, (band + 1) * rows):
+                band_hash = band_hash * np.uint64(0x100000001B3) + signatures[valid_rows, column].astype(np.uint64)
+            order = np.argsort(band_hash, kind='stable')
+            sorted_hash = band_hash[order]
+            boundaries = np.flatnonzero(np.diff(sorted_hash)) + 1
+            for members in np.split(valid_rows[order], boundaries):
+                if len(members) < 2:
+                    continue
+                if len(members) <= max_bucket_pairs:
+                    for x in range(len(members)):
+                        for y in range(x + 1, len(members)):
+                            i, j = members[x], members[y]
+                            if uf.find(i) != uf.find(j) and similar(i, j):
+                                uf.union(i, j)
+                else:
+                    first = members[0]
+                    for j in members[1:]:
+                        if uf.find(first) != uf.find(j) and similar(first, j):
+                            uf.union(first, j)
+
+    clusters = {}
+    for i in valid_rows:
+        clusters.setdefault(uf.find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def _find_column(df, *names):
+    lower = {column.lower(): column for column in df.columns}
+    for name in names:
+        if name.lower() in lower:
+            return lower[name.lower()]
+    return None
+
+
+def _read_folder_csvs(folder):
+    for root, dirs, files in os.walk(folder):
+        for file in files:
+            if file.endswith('.csv') and file != "failed_downloads.csv":
+                yield os.path.join(root, file)
+
+
+def load_records(arxiv_csv=None, ebsco_folder=None, informs_folder=None):
+    """
+    读取 arXiv 目录CSV 与 EBSCO / INFORMS 的CSV文件夹，统一为
+    source / key / title / text 四列：key 为 arXiv 的 no（无编号时为 arXiv ID），其他来源为规范化标题。
+    """
+    frames = []
+    if arxiv_csv:
+        df = pd.read_csv(arxiv_csv, encoding='utf-8')
+        keys = df['no'].astype(str) if 'no' in df.columns else df['pdf_link'].map(extract_arxiv_id)
+        frames.append(pd.DataFrame({
+            'source': 'arxiv',
+            'key': keys,
+            'title': df['title'],
+            'text': df['title'].fillna('') + ' ' + df.get('abstract', pd.Series('', index=df.index)).fillna(''),
+        }))
+
+    for source, folder in (('ebsco', ebsco_folder), ('informs', informs_folder)):
+        if not folder:
+            continue
+        for csv_file in _read_folder_csvs(folder):
+            try:
+                df = pd.read_csv(csv_file, encoding='utf-8')
+            except Exception as e:
+                print(f"读取CSV文件时出错 {csv_file}: {e}")
+                continue
+            title_column = _find_column(df, 'title')
+            if title_column is None:
+                continue
+            abstract_column = _find_column(df, 'abstract', 'ab', 'description')
+            abstract = df[abstract_column].fillna('') if abstract_column else ''
+            frames.append(pd.DataFrame({
+                'source': source,
+                'key': df[title_column].map(normalize_title),
+                'title': df[title_column],
+                'text': df[title_column].fillna('') + ' ' + abstract,
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=['source', 'key', 'title', 'text'])
+    records = pd.concat(frames, ignore_index=True)
+    return records.drop_duplicates(['source', 'key']).reset_index(drop=True)
+
+
+def detect_duplicates(arxiv_csv=None, ebsco_folder=None, informs_folder=None, output_csv=DEFAULT_DUPLICATES_CSV,
+                      threshold=0.8, num_perm=128, bands=16):
+    """
+    检测近似重复并写出 output_csv：cluster / source / key / title / canonical。
+    每个簇中来源优先级最高（arXiv > INFORMS > EBSCO）、同来源中编号最小的记录为规范成员。
+    """
+    records = load_records(arxiv_csv, ebsco_folder, informs_folder)
+    print(f"共读取 {len(records)} 条记录，计算 MinHash 签名...")
+    signatures = minhash_signatures(records['text'].tolist(), num_perm=num_perm)
+    clusters = find_duplicate_clusters(signatures, bands=bands, threshold=threshold)
+
+    rows = []
+    for cluster_id, members in enumerate(clusters, start=1):
+        cluster = records.iloc[members].copy()
+        cluster['priority'] = cluster['source'].map(SOURCE_PRIORITY)
+        cluster['key_order'] = pd.to_numeric(cluster['key'], errors='coerce')
+        cluster = cluster.sort_values(['priority', 'key_order'], kind='stable')
+        for position, (_, record) in enumerate(cluster.iterrows()):
+            rows.append({'cluster': cluster_id, 'source': record['source'], 'key': record['key'],
+                         'title': record['title'], 'canonical': position == 0})
+
+    result = pd.DataFrame(rows, columns=['cluster', 'source', 'key', 'title', 'canonical'])
+    result.to_csv(output_csv, index=False, encoding='utf-8')
+    skipped = int((~result['canonical']).sum()) if len(result) else 0
+    print(f"发现 {len(clusters)} 个重复簇，可跳过 {skipped} 条非规范记录，已保存到 '{output_csv}'")
+    return result
+
+
+def load_non_canonical_keys(duplicates_csv, source):
+    """返回某个来源中应跳过下载的记录 key 集合"""
+    df = pd.read_csv(duplicates_csv, encoding='utf-8', dtype={'key': str})
+    skipped = df[(df['source'] == source) & ~df['canonical'].astype(bool)]
+    return set(skipped['key'])
+
+
+if __name__ == '__main__':
+    detect_duplicates(arxiv_csv="paper_result_no.csv", ebsco_folder=None, informs_folder=None)
@@ -6,8 +6,13 @@ from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
 from tqdm import tqdm
-import queue
-import time # Import time module for delays
+from contextlib import contextmanager
+from proxy_pool import build_proxies, proxied_request, ProxyPool
+from providers import Provider
+from scheduler import DownloadScheduler
+
+
+ARXIV_ID_PATTERN = re.compile(r'(?:abs|pdf)/((?:\d{4}\.\d{4,5})|(?:[a-z\-]+(?:\.[A-Z]{2})?/\d{7}))(?:v\d+)?')
 
 
 # 清理非法文件名字符
@@ -22,79 +27,177 @@ def sanitize_filename(title):
     return cleaned_title.strip()
 
 
-# 下载PDF并保存到指定文件夹
-def download_paper(row, download_dir, proxies, output_queue):
+# 生成 no_year_title.pdf 文件名
+def paper_file_name(row):
     """
-    Downloads a single PDF file and saves it to the specified directory.
-    The file is named in the format: no_year_title.pdf
+    Builds the file name of a paper in the format: no_year_title.pdf
     """
     title = sanitize_filename(row['title'])
     # Ensure year exists, if not, use 'Unknown'
     year = row['year'] if 'year' in row and pd.notna(row['year']) else 'Unknown'
-    pdf_url = row['pdf_link']
-    
+
     # Get 'no' value from the row. If not present or NaN, default to 'UnknownNo'.
     paper_no = row['no'] if 'no' in row and pd.notna(row['no']) else 'UnknownNo'
     # Convert paper_no to string to ensure it can be concatenated
-    paper_no_str = str(paper_no) 
+    paper_no_str = str(paper_no)
+
+    return f"{paper_no_str}_{year}_{title}.pdf"
+
+
+# 从 pdf_link 中提取 arXiv ID（不含版本号）
+def extract_arxiv_id(pdf_link):
+    """
+    Extracts the arXiv identifier without version from a pdf/abs link,
+    e.g. https://arxiv.org/pdf/2310.12345v2 -> 2310.12345, .../pdf/cs/0101001v1 -> cs/0101001.
+    Returns None if no identifier is found.
+    """
+    if not isinstance(pdf_link, str):
+        return None
+    match = ARXIV_ID_PATTERN.search(pdf_link)
+    return match.group(1) if match else None
+
+
+# 下载优先级策略
+def priority_filtered_first(df, filtered_csv=None, **kwargs):
+    """
+    Priority key that puts rows surviving filter.py (present in filtered_csv by 'no') first.
+    Rows with a truthy 'tags' column are treated as matched as well.
+    """
+    matched = pd.Series(False, index=df.index)
+    if filtered_csv is not None:
+        try:
+            filtered_nos = pd.read_csv(filtered_csv, usecols=['no'])['no']
+            matched |= pd.to_numeric(df['no'], errors='coerce').isin(pd.to_numeric(filtered_nos, errors='coerce'))
+        except Exception as e:
+            print(f"读取筛选结果 '{filtered_csv}' 时发生错误: {e}. 忽略该优先级。")
+    if 'tags' in df.columns:
+        matched |= df['tags'].notna() & (df['tags'].astype(str).str.strip() != '')
+    return (~matched).astype(int)
+
 
-    # Construct the full file path: no_year_title.pdf
-    file_path = Path(download_dir) / f"{paper_no_str}_{year}_{title}.pdf"
+def priority_newest_first(df, **kwargs):
+    """
+    Priority key that orders rows by submission_date descending; unknown dates go last.
+    """
+    dates = pd.to_datetime(df['submission_date'], errors='coerce')
+    key = dates.map(lambda d: -d.timestamp() if pd.notna(d) else float('inf'))
+    return key.astype(float)
 
+
+def probe_pdf_size(pdf_url, proxies=None, timeout=10):
+    """
+    Returns the Content-Length reported by a HEAD request, or None if unknown.
+    """
     try:
-        if pd.isna(pdf_url) or pdf_url == "No PDF link found":
-            # If no PDF link, log and skip
-            output_queue.put(f"无PDF链接，跳过下载: 《{row['title']}》")
-            return
-
-        # Check if the file already exists, skip download if it does
-        if file_path.exists():
-            output_queue.put(f"文件已存在，跳过下载: 《{row['title']}》 -> {file_path}")
-            return
-
-        # Send HTTP GET request to download the PDF
-        response = requests.get(pdf_url, proxies=proxies, timeout=30) # Added timeout setting
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-
-        # Write the downloaded content to the file
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        output_queue.put(f"成功下载: 《{row['title']}》 -> {file_path}")
-        
-        time.sleep(3) # Add a 3-second delay after each successful download
-
-    except requests.exceptions.RequestException as e:
-        # Catch request-related exceptions (e.g., connection errors, timeouts, HTTP errors)
-        output_queue.put(f"下载失败: 《{row['title']}》 -> 【{pdf_url}】: {e}")
-    except Exception as e:
-        # Catch other unexpected exceptions
-        output_queue.put(f"处理失败: 《{row['title']}》 -> 【{pdf_url}】: {e}")
+        response = proxied_request('HEAD', pdf_url, proxies=proxies, timeout=timeout, allow_redirects=True)
+        response.raise_for_status()
+        length = response.headers.get('Content-Length')
+        return int(length) if length is not None else None
+    except (requests.exceptions.RequestException, ValueError):
+        return None
 
 
-def papers_file_core(path_of_csv, proxies_port=None, max_workers=3, start_from_no=None, specific_nos_list=None): # MODIFIED: Added specific_nos_list parameter
+def priority_smallest_first(df, proxies=None, probe_workers=8, **kwargs):
     """
-    Core function for downloading PDF papers from a CSV file.
+    Priority key that orders rows by PDF size from a cheap HEAD probe (shortest-first).
+    Rows whose size cannot be probed go last.
+    """
+    def probe(url):
+        if not isinstance(url, str) or not url.startswith('http'):
+            return None
+        return probe_pdf_size(url, proxies)
+
+    urls = df['pdf_link'].tolist()
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        sizes = list(tqdm(executor.map(probe, urls), desc="探测文件大小", ncols=100, total=len(urls)))
+    return pd.Series([size if size is not None else float('inf') for size in sizes], index=df.index)
+
+
+PRIORITY_POLICIES = {
+    'filtered': priority_filtered_first,
+    'newest': priority_newest_first,
+    'smallest': priority_smallest_first,
+}
+
+
+def order_by_priority(df, priority, **policy_kwargs):
+    """
+    Orders rows by one or more priority policies; earlier policies take precedence.
+    A policy is either a name in PRIORITY_POLICIES or a callable (df, **kwargs) -> key Series,
+    where smaller keys are downloaded first. Ties keep the original CSV order.
     """
-    # Set up local proxies if a proxy port is provided
-    proxies = {
-        "http": f"http://127.0.0.1:{proxies_port}",
-        "https": f"http://127.0.0.1:{proxies_port}"
-    } if proxies_port is not None else None
+    policies = [priority] if isinstance(priority, str) or callable(priority) else list(priority)
+    keys = []
+    for i, policy in enumerate(policies):
+        func = PRIORITY_POLICIES.get(policy) if isinstance(policy, str) else policy
+        if func is None:
+            print(f"警告：未知的优先级策略 '{policy}'，已忽略。可选值: {list(PRIORITY_POLICIES)}")
+            continue
+        keys.append(pd.Series(func(df, **policy_kwargs), index=df.index).rename(f"_priority_{i}"))
+
+    if not keys:
+        return df
+    keyed = pd.concat([df] + keys, axis=1)
+    key_columns = [key.name for key in keys]
+    return keyed.sort_values(key_columns, kind='stable').drop(columns=key_columns)
+
+
+def load_nos_manifest(manifest_path):
+    """
+    Reads a work-list manifest (one 'no' per line, '#' starts a comment) and returns the numbers as ints.
+    Lines that are not a paper number (headers, 'nan', ...) are reported and skipped.
+    """
+    nos = []
+    skipped = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            # Tools that write numbers through pandas may produce '2301.0'
+            try:
+                value = float(line)
+            except ValueError:
+                value = None
+            if value is None or not value.is_integer():
+                skipped.append(f"{line_no}: {line!r}")
+                continue
+            nos.append(int(value))
+    if skipped:
+        print(f"警告：编号清单 '{manifest_path}' 中有 {len(skipped)} 行不是论文编号，已跳过: {skipped[:5]}")
+    return nos
+
+
+def load_papers_for_download(path_of_csv, start_from_no=None, specific_nos_list=None):
+    """
+    Reads the catalog CSV, derives the 'year' column and applies the
+    specific_nos_list / start_from_no selection. Returns None on invalid input.
+    specific_nos_list may also be the path of a manifest file (see load_nos_manifest).
+    """
+    if isinstance(specific_nos_list, (str, os.PathLike)):
+        try:
+            specific_nos_list = load_nos_manifest(specific_nos_list)
+        except (OSError, ValueError) as e:
+            print(f"读取编号清单 '{specific_nos_list}' 时发生错误: {e}")
+            return None
+        if not specific_nos_list:
+            print("编号清单为空，没有需要下载的论文。")
+            return None
 
     try:
         # Read the CSV file
         df = pd.read_csv(path_of_csv)
     except FileNotFoundError:
         print(f"错误：找不到文件 '{path_of_csv}'。请检查文件路径。")
-        return
+        return None
     except Exception as e:
         print(f"读取CSV文件时发生错误: {e}")
-        return
+        return None
 
     # Ensure 'submission_date' column exists and convert to datetime format
     if 'submission_date' not in df.columns:
         print("错误：CSV文件中缺少 'submission_date' 列。")
-        return
+        return None
     
     # Try to convert 'submission_date' to datetime, handling possible errors
     df['submission_date'] = pd.to_datetime(df['submission_date'], errors='coerce')
@@ -133,36 +236,118 @@ def papers_file_core(path_of_csv, proxies_port=None, max_workers=3, start_from_n
     # Ensure 'title' and 'pdf_link' columns exist
     if 'title' not in df.columns or 'pdf_link' not in df.columns:
         print("错误：CSV文件中缺少 'title' 或 'pdf_link' 列。")
-        return
+        return None
+
+    return df
+
+
+class ArxivHttpProvider(Provider):
+    """
+    Downloads arXiv PDFs over HTTP (optionally through a proxy pool) into a PdfLibrary,
+    named no_year_title.pdf (see paper_file_name). Scheduled by scheduler.DownloadScheduler.
+    """
+
+    name = 'arxiv'
+    workers = 3
+    # Gap between downloads across all threads (replaces the old 3-second sleep in every thread)
+    min_interval = 1
+    max_attempts = 2
+
+    def __init__(self, output_folder="downloaded_pdfs", layout=None, workers=None, proxies_port=None):
+        super().__init__(output_folder, layout, workers)
+        # Set up local proxies if a proxy port is provided; a list of ports/URLs builds a proxy pool
+        self.proxies = build_proxies(proxies_port)
+
+    def load_records(self, path_of_csv, duplicates_csv=None, start_from_no=None, specific_nos_list=None,
+                     priority=None, filtered_csv=None):
+        """
+        Returns the papers to download, in download order, as records for the scheduler.
+        Papers without a PDF link and files already on disk (non-empty) are skipped.
+        """
+        df = load_papers_for_download(path_of_csv, start_from_no, specific_nos_list)
+        if df is None:
+            return []
 
+        # Skip non-canonical members of near-duplicate clusters
+        if duplicates_csv is not None:
+            from dedup import load_non_canonical_keys
+            skip_keys = load_non_canonical_keys(duplicates_csv, 'arxiv')
+            is_duplicate = df['no'].astype(str).isin(skip_keys) | df['pdf_link'].map(extract_arxiv_id).isin(skip_keys)
+            print(f"跳过 {int(is_duplicate.sum())} 篇近似重复论文。")
+            df = df[~is_duplicate]
+
+        print(f"总计找到 {len(df)} 篇论文进行处理。")
+
+        # Filter out rows without title or PDF link to avoid unnecessary processing
+        no_link = df['pdf_link'].isna() | (df['pdf_link'] == "No PDF link found")
+        if no_link.any():
+            print(f"无PDF链接，跳过 {int(no_link.sum())} 篇。")
+        papers_to_download = df[df['title'].notna() & ~no_link]
+
+        # Order the queue so the highest-value papers are on disk first.
+        # The scheduler hands out records in order, so sorting here is the priority queue.
+        if priority is not None:
+            papers_to_download = order_by_priority(papers_to_download, priority, filtered_csv=filtered_csv, proxies=self.proxies)
+            print(f"已按优先级策略 {priority} 排序下载队列。")
+
+        records = []
+        existing = 0
+        for _, row in papers_to_download.iterrows():
+            file_name = paper_file_name(row)
+            # Zero-byte files are left over from interrupted downloads and are fetched again
+            file_path = Path(self.library.path_for(file_name))
+            if file_path.exists() and file_path.stat().st_size > 0:
+                existing += 1
+                continue
+            records.append({'no': row['no'], 'title': row['title'], 'pdf_link': row['pdf_link'], 'pdf_filename': file_name})
+        if existing:
+            print(f"文件已存在，跳过 {existing} 篇。")
+        return records
+
+    def describe(self, record):
+        return f"下载: 《{record['title']}》 -> {record['pdf_filename']}"
+
+    def resolve(self, context, record):
+        return record['pdf_link']
+
+    @contextmanager
+    def fetch(self, context, record, url):
+        # Written next to the final file and moved into place by store()
+        part_path = Path(f"{self.library.path_for(record['pdf_filename'])}.part")
+        try:
+            response = proxied_request('GET', url, proxies=self.proxies, timeout=30) # Added timeout setting
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+            part_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(part_path, 'wb') as f:
+                f.write(response.content)
+            yield str(part_path)
+        finally:
+            if part_path.exists():
+                part_path.unlink()
+
+    def close(self):
+        if isinstance(self.proxies, ProxyPool):
+            self.proxies.print_stats()
+            self.proxies.stop_health_checks()
+
+
+def papers_file_core(path_of_csv, proxies_port=None, max_workers=3, start_from_no=None, specific_nos_list=None, priority=None, filtered_csv=None, duplicates_csv=None, layout=None): # MODIFIED: Added specific_nos_list parameter
+    """
+    Core function for downloading PDF papers from a CSV file.
+    priority: None keeps CSV order; otherwise a policy name ('filtered', 'newest', 'smallest'),
+              a callable, or a list of them applied in order (see order_by_priority).
+    filtered_csv: CSV produced by filter.py, used by the 'filtered' policy.
+    proxies_port: a single port/URL, or a list of them to spread requests over a health-checked proxy pool.
+    duplicates_csv: clusters written by dedup.py; non-canonical members of a near-duplicate cluster are skipped.
+    layout: directory layout of downloaded_pdfs ('flat', 'year', 'hash'); None keeps the recorded layout (see pdf_library).
+    Downloads run through scheduler.DownloadScheduler (max_workers threads, retries, download_ledger.csv).
+    """
     # Define a single download directory for all PDFs
-    download_base_dir = "downloaded_pdfs"
-    os.makedirs(download_base_dir, exist_ok=True) # Create the directory if it doesn't exist
-
-    print(f"将所有PDF下载到: {download_base_dir}")
-    # MODIFIED: Update total count after filtering
-    print(f"总计找到 {len(df)} 篇论文进行处理。")
-
-    # Create a thread-safe output queue to collect download logs
-    output_queue = queue.Queue()
-
-    # Use a thread pool for concurrent downloads
-    # Filter out rows without title or PDF link to avoid unnecessary processing
-    papers_to_download = df[df['title'].notna() & df['pdf_link'].notna()]
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit download tasks to the thread pool
-        futures = [executor.submit(download_paper, row, download_base_dir, proxies, output_queue) 
-                   for _, row in papers_to_download.iterrows()]
-        
-        # Use tqdm to display download progress
-        for future in tqdm(futures, desc="下载论文中", mininterval=0.1, ncols=100, total=len(futures)):
-            future.result() # Ensure all tasks complete and catch potential exceptions
-
-    # After downloads, print all log messages
-    print("\n--- 下载结果日志 ---")
-    while not output_queue.empty():
-        print(output_queue.get())
+    provider = ArxivHttpProvider("downloaded_pdfs", layout, max_workers, proxies_port)
+    print(f"将所有PDF下载到: {provider.library.root} ({provider.library.layout} 布局)")
+
+    records = provider.load_records(path_of_csv, duplicates_csv, start_from_no, specific_nos_list, priority, filtered_csv)
+    DownloadScheduler(provider, max_workers).run(records)
 
     print("\n所有PDF下载任务已完成！")
 
@@ -174,7 +359,11 @@ if __name__ == '__main__':
     # MODIFIED: Example usage for specific_nos_list.
     # To download specific 'no' values (e.g., 21 and 34):
     # papers_file_core(path_of_csv="paper_result.csv", proxies_port=None, max_workers=5, specific_nos_list=[21, 34])
+    # To download the numbers listed in a manifest (e.g. written by copy_selected_pdfs):
+    # papers_file_core(path_of_csv="paper_result_no.csv", proxies_port=None, max_workers=5, specific_nos_list="missing_nos.txt")
     # To download from a specific 'no' onwards (e.g., from 10 onwards):
     # papers_file_core(path_of_csv="paper_result.csv", proxies_port=None, max_workers=5, start_from_no=10)
+    # To download filter.py survivors first, newest first within each group:
+    # papers_file_core(path_of_csv="paper_result_no.csv", max_workers=3, priority=['filtered', 'newest'], filtered_csv="paper_result_no_filter.csv")
     # To download all (default):
     papers_file_core(path_of_csv="paper_result_no.csv", proxies_port=None, max_workers=3, start_from_no=None, specific_nos_list=[355, 390, 413, 977, 1132, 1978, 2792])
@@ -0,0 +1,196 @@
+"""
+EBSCO / INFORMS 下载任务的持久化状态：中断后继续、只重试失败的记录
+
+- 任务文件 <PDF输出目录>/download_job.csv 记录每条记录的状态（pending/ok/failed）、累计尝试次数、
+  下次可重试的时间、失败原因和记录本身；每条记录完成时追加一行，后写的行覆盖先写的（同 pdf_library 的索引），
+  中断时最多丢失正在下载的那几条的结果
+- 继续：上次未完成（pending）的记录按原顺序继续下载，不再重新读取CSV文件夹
+- 重试：只取出失败的记录；第 n 次失败后至少等待 backoff * 2^(n-1) 秒才会再次重试，累计尝试 max_attempts 次后放弃
+"""
+import csv
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+JOB_FILE = "download_job.csv"
+JOB_COLUMNS = ['key', 'status', 'attempts', 'updated', 'next_retry', 'error', 'record']
+DEFAULT_BACKOFF = 600
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+class DownloadJob:
+    """
+    一个输出目录的下载任务。key(record) 返回记录的唯一键（即 Provider.record_key）。
+    """
+
+    def __init__(self, path, key, backoff=DEFAULT_BACKOFF, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.key = key
+        self.backoff = backoff
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # key -> 状态行（dict），按记录第一次出现的顺序
+        self.entries = {}
+        if os.path.exists(path):
+            skipped = 0
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    # 追加被中断时最后一行可能不完整，跳过（同 pdf_library 的索引）
+                    try:
+                        row['attempts'] = int(row['attempts'])
+                        json.loads(row['record'])
+                    except (TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    if row['status'] not in ('pending', 'ok', 'failed') or None in row.values():
+                        skipped += 1
+                        continue
+                    self.entries[row['key']] = row
+            if skipped:
+                # 重写任务文件，之后追加的行不会接在残行后面
+                print(f"[WARN] 任务文件 '{path}' 中有 {skipped} 行不完整，已忽略")
+                self._write(self.entries.values())
+
+    def _row(self, record, status, attempts, next_retry='', error=''):
+        return {'key': self.key(record), 'status': status, 'attempts': attempts,
+                'updated': datetime.now().isoformat(timespec='seconds'), 'next_retry': next_retry,
+                'error': error or '', 'record': json.dumps(record, ensure_ascii=False, default=str)}
+
+    def _append(self, rows):
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=JOB_COLUMNS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+        for row in rows:
+            self.entries[row['key']] = row
+
+    def _write(self, rows):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=JOB_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.path)
+
+    def start(self, records):
+        """开始新任务：重写任务文件，所有记录为 pending"""
+        rows = [self._row(record, 'pending', 0) for record in records]
+        self._write(rows)
+        self.entries = {row['key']: row for row in rows}
+
+    def records(self, status):
+        return [json.loads(row['record']) for row in self.entries.values() if row['status'] == status]
+
+    def counts(self):
+        counts = {'pending': 0, 'ok': 0, 'failed': 0}
+        for row in self.entries.values():
+            counts[row['status']] += 1
+        return counts
+
+    def take_failed(self, now=None):
+        """
+        取出到了重试时间、尝试次数未用完的失败记录，并标记为 pending（重试中断后也能继续），
+        返回 (记录列表, 未到重试时间的条数, 尝试次数已用完的条数)
+        """
+        now = (now or datetime.now()).isoformat(timespec='seconds')
+        due, waiting, exhausted = [], 0, 0
+        for row in self.entries.values():
+            if row['status'] != 'failed':
+                continue
+            if row['attempts'] >= self.max_attempts:
+                exhausted += 1
+            elif row['next_retry'] > now:
+                waiting += 1
+            else:
+                due.append(row)
+        if due:
+            with self._lock:
+                self._append([dict(row, status='pending', updated=now, error='') for row in due])
+        return [json.loads(row['record']) for row in due], waiting, exhausted
+
+    def note(self, record, attempts, error):
+        """记录未结束的尝试（如混合模式中HTTP下载失败、改用浏览器）：累加尝试次数并保留原因，记录仍为 pending"""
+        with self._lock:
+            previous = self.entries.get(self.key(record))
+            total = (previous['attempts'] if previous else 0) + attempts
+            self._append([self._row(record, 'pending', total, error=error)])
+
+    def finish(self, record, success, attempts, error=None):
+        """记录一条记录本次运行的结果（attempts 为本次运行的尝试次数，累加到总次数），线程安全"""
+        with self._lock:
+            previous = self.entries.get(self.key(record))
+            total = (previous['attempts'] if previous else 0) + attempts
+            # 之前 note 记下的失败原因一并保留
+            if previous and previous['status'] == 'pending' and previous['error'] and not success:
+                error = f"{error}; {previous['error']}"
+            if success:
+                self._append([self._row(record, 'ok', total)])
+            else:
+                delay = self.backoff * 2 ** (max(total, 1) - 1)
+                next_retry = (datetime.now() + timedelta(seconds=delay)).isoformat(timespec='seconds')
+                self._append([self._row(record, 'failed', total, next_retry, error)])
+
+
+def plan_records(provider, load, retry_failed=False, resume=True, failed_csv=None):
+    """
+    根据输出目录中的任务状态决定本次要下载的记录，返回 (DownloadJob, 记录列表)：
+    - retry_failed: 只重试失败的记录；没有任务文件时读取 failed_csv（旧版本写出的失败记录）
+    - resume: 有未完成的记录时从中断处继续（已在库中的文件直接记为完成）
+    - 否则调用 load() 读取全部记录，开始新任务
+    """
+    job = DownloadJob(os.path.join(provider.library.root, JOB_FILE), provider.record_key)
+    counts = job.counts()
+
+    if retry_failed:
+        if not job.entries and failed_csv and os.path.exists(failed_csv):
+            records = provider.load_failed_records(failed_csv)
+            print(f"从 {failed_csv} 读取 {len(records)} 条失败记录")
+            job.start(records)
+            return job, records
+        # 上次重试中断时未完成的记录也一并下载
+        interrupted = job.records('pending')
+        records, waiting, exhausted = job.take_failed()
+        print(f"重试失败记录: {len(records)} 条（未到重试时间 {waiting} 条，已尝试 {job.max_attempts} 次放弃 {exhausted} 条）"
+              + (f"，上次中断未完成 {len(interrupted)} 条" if interrupted else ""))
+        return job, interrupted + records
+
+    if resume and counts['pending']:
+        records = job.records('pending')
+        existing = provider.library.existing(record['pdf_filename'] for record in records)
+        done = [record for record in records if record['pdf_filename'] in existing]
+        for record in done:
+            job.finish(record, True, 0)
+        records = [record for record in records if record['pdf_filename'] not in existing]
+        print(f"继续上次中断的任务: 已完成 {counts['ok'] + len(done)} 条，失败 {counts['failed']} 条，剩余 {len(records)} 条")
+        return job, records
+
+    records = load()
+    job.start(records)
+    return job, records
+
+
+def ask_job_mode(output_folder, failed_csv=None):
+    """
+    交互式入口使用：输出目录中有未完成或失败的记录时，询问继续、只重试失败的记录还是重新开始，
+    返回 (resume, retry_failed)
+    """
+    path = os.path.join(output_folder, JOB_FILE)
+    if os.path.exists(path):
+        counts = DownloadJob(path, key=None).counts()
+    elif failed_csv and os.path.exists(failed_csv):
+        with open(failed_csv, 'r', newline='', encoding='utf-8') as f:
+            counts = {'pending': 0, 'ok': 0, 'failed': sum(1 for _ in csv.reader(f)) - 1}
+    else:
+        return True, False
+    if not counts['pending'] and not counts['failed']:
+        return True, False
+
+    print(f"\n📌 {output_folder} 中有上次的下载任务: 未完成 {counts['pending']} 条，失败 {counts['failed']} 条")
+    choice = input("1. 继续未完成的记录 (c)\n2. 只重试失败的记录 (r)\n3. 重新读取CSV开始新任务 (n)\n"
+                   "请选择 (默认c): ").lower().strip()
+    if choice == 'r':
+        return True, True
+    return choice != 'n', False
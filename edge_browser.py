@@ -0,0 +1,283 @@
+"""
+EBSCO / INFORMS 浏览器下载的公共部分
+
+- encode_title_for_filename / decode_filename_back: 标题与文件名之间的特殊字符编码
+- setup_edge_driver: 启动 Edge（工作池中的配置副本、精简模式、下载事件）
+- BrowserProvider: 浏览器类下载来源的基类（见 providers），fetch 负责打开页面、独立下载目录、
+  等待下载完成，子类只需实现 trigger_download（在页面上点击下载按钮）
+"""
+import html
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+import pandas as pd
+from selenium import webdriver
+from selenium.webdriver.edge.options import Options
+
+from browser_download import (DownloadWatcher, SelectorCache, TaskDownloadDir, WaitStats, enable_download_events,
+                              page_memory_mb, set_download_dir, timed, wait_for_page_ready)
+from browser_pool import apply_lean_options, block_heavy_requests, copy_auth_profile, copy_browser_profile
+from providers import DownloadError, Provider
+
+# 文件名不允许的特殊字符 -> HTML实体形式（去掉&以适应文件名）
+FILENAME_CHAR_MAP = {
+    '<': '#x3c;',
+    '>': '#x3e;',
+    ':': '#x3a;',
+    '"': '#x22;',
+    '/': '#x2f;',
+    '\\': '#x5c;',
+    '|': '#x7c;',
+    '?': '#x3f;',
+    '*': '#x2a;'
+}
+
+
+def encode_title_for_filename(title, default="", max_length=None):
+    """
+    将标题中的特殊字符编码为HTML实体形式，用于文件名
+    default: 标题为空时的文件名；max_length: 文件名最大长度
+    """
+    if pd.isna(title):
+        return default
+
+    title = str(title).strip()
+
+    # 首先解码已存在的HTML实体
+    title = html.unescape(title)
+
+    # 处理URL编码
+    title = unquote(title)
+
+    for char, encoded in FILENAME_CHAR_MAP.items():
+        title = title.replace(char, encoded)
+
+    # 移除多余的空格，移除末尾的点号
+    title = re.sub(r'\s+', ' ', title).strip().rstrip('.')
+
+    # 限制文件名长度
+    if max_length is not None and len(title) > max_length:
+        title = title[:max_length]
+
+    return title
+
+
+def decode_filename_back(filename):
+    """
+    将编码后的文件名解码回原始标题
+    """
+    if filename.endswith('.pdf'):
+        filename = filename[:-4]
+
+    for char, encoded in FILENAME_CHAR_MAP.items():
+        filename = filename.replace(encoded, char)
+
+    return filename
+
+
+def find_csv_files(input_folder):
+    """input_folder 及其子文件夹中的所有CSV文件"""
+    csv_files = []
+    for root, dirs, files in os.walk(input_folder):
+        for file in files:
+            if file.endswith('.csv'):
+                csv_files.append(os.path.join(root, file))
+    return csv_files
+
+
+def setup_edge_driver(worker_id=None, lean=False):
+    """
+    设置Edge浏览器驱动，配置下载设置，返回 (driver, 下载目录)，失败时返回 (None, None)
+    worker_id: 浏览器工作池中的编号；指定时使用该浏览器自己的配置副本和下载目录
+    lean: 精简模式，无头运行，只复制登录 Cookie，不加载图片/字体/媒体/统计脚本（见 browser_pool）
+    """
+    edge_options = Options()
+
+    # 设置下载路径为临时目录
+    download_dir = os.path.join(os.getcwd(), "temp_downloads")
+    if worker_id is not None:
+        download_dir = os.path.join(download_dir, f"worker_{worker_id}")
+    if not os.path.exists(download_dir):
+        os.makedirs(download_dir)
+
+    # 配置下载设置
+    prefs = {
+        "download.default_directory": download_dir,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+        "plugins.always_open_pdf_externally": True
+    }
+    if lean:
+        prefs["profile.managed_default_content_settings.images"] = 2
+        apply_lean_options(edge_options)
+    edge_options.add_experimental_option("prefs", prefs)
+
+    # 使用现有的Edge用户配置
+    try:
+        user_data_dir = os.path.expanduser("~\\AppData\\Local\\Microsoft\\Edge\\User Data")
+        if os.path.exists(user_data_dir):
+            if lean:
+                user_data_dir = copy_auth_profile(user_data_dir, f"lean_{'main' if worker_id is None else worker_id}")
+            elif worker_id is not None:
+                user_data_dir = copy_browser_profile(user_data_dir, worker_id)
+            edge_options.add_argument(f"--user-data-dir={user_data_dir}")
+            edge_options.add_argument("--profile-directory=Default")
+    except:
+        print("无法使用用户配置，将使用临时配置")
+
+    # 其他选项
+    edge_options.add_argument("--no-sandbox")
+    edge_options.add_argument("--disable-dev-shm-usage")
+    edge_options.add_argument("--disable-blink-features=AutomationControlled")
+    edge_options.add_argument("--disable-extensions")
+    edge_options.add_argument("--disable-logging")
+    edge_options.add_argument("--log-level=3")
+    edge_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
+    edge_options.add_experimental_option('useAutomationExtension', False)
+    # 开启性能日志，用 DevTools 下载事件检测下载完成
+    enable_download_events(edge_options)
+
+    try:
+        driver = webdriver.Edge(options=edge_options)
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        if lean:
+            # 无头模式默认不允许下载，需要显式指定下载目录
+            set_download_dir(driver, download_dir)
+            block_heavy_requests(driver)
+        print(f"Edge浏览器启动成功{' (精简模式)' if lean else ''}")
+        return driver, download_dir
+    except Exception as e:
+        print(f"启动Edge浏览器失败: {e}")
+        return None, None
+
+
+def wait_for_download_complete(download_dir, timeout=180, watcher=None):
+    """
+    等待下载完成：由文件系统事件 (inotify) 或浏览器下载事件触发，文件一完成就返回文件名；
+    两者都不可用时退回轮询（见 browser_download.DownloadWatcher）。
+    watcher 应在点击下载按钮之前创建；不传时以下载目录中已有的PDF为候选
+    （下载目录应为本次下载独立使用的目录，见 browser_download.TaskDownloadDir）。
+    """
+    if watcher is not None:
+        return watcher.wait(timeout)
+    with DownloadWatcher(download_dir, ignore_existing=False) as watcher:
+        return watcher.wait(timeout)
+
+
+def stop_edge_driver(driver, download_dir):
+    """关闭浏览器并清理其下载目录，有遗留文件时保留供手动检查"""
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"关闭浏览器时出错: {e}")
+    try:
+        if download_dir and os.path.exists(download_dir):
+            remaining_files = os.listdir(download_dir)
+            if remaining_files:
+                print(f"📁 临时目录中还有文件: {remaining_files} ({download_dir})")
+            else:
+                shutil.rmtree(download_dir)
+    except Exception as e:
+        print(f"清理临时目录时出错: {e}")
+
+
+class BrowserProvider(Provider):
+    """
+    浏览器类下载来源：每个工作者一个 Edge（多个工作者时各用一份配置副本和下载目录）。
+    子类设置 url_key（记录中链接所在的字段）和 legacy_fixed_sleeps，并实现 trigger_download。
+    """
+
+    workers = 1
+    min_interval = 10
+    # 浏览器流程中找不到按钮通常是没有全文权限，重试只会再等一轮超时
+    max_attempts = 1
+    restart_on_failures = True
+    url_key = 'url'
+    # 改为条件等待之前各阶段的固定 sleep（秒），用于统计节省的时间
+    legacy_fixed_sleeps = {}
+    # 由标题生成文件名的参数（见 encode_title_for_filename）
+    filename_options = {}
+
+    def __init__(self, output_folder, layout=None, workers=None, lean=False, page_timeout=30, download_timeout=180):
+        super().__init__(output_folder, layout, workers)
+        self.lean = lean
+        self.page_timeout = page_timeout
+        self.download_timeout = download_timeout
+        self.stats = WaitStats(self.legacy_fixed_sleeps)
+        # 各页面模板上找到按钮的选择器，跨运行保存，下次优先尝试
+        self.selector_cache = SelectorCache()
+
+    def open_worker(self, worker_id):
+        # 单个浏览器时沿用原配置
+        driver, download_dir = setup_edge_driver(worker_id if self.workers > 1 else None, self.lean)
+        return (driver, download_dir) if driver else None
+
+    def close_worker(self, context):
+        stop_edge_driver(*context)
+
+    def close(self):
+        self.stats.print_summary()
+
+    def resolve(self, context, record):
+        return record[self.url_key]
+
+    def load_failed_records(self, failed_csv):
+        """读取 failed_downloads.csv 中的记录，旧版本写出的文件没有 pdf_filename 列时由标题生成"""
+        df = pd.read_csv(failed_csv, encoding='utf-8')
+        if 'pdf_filename' not in df.columns:
+            df['pdf_filename'] = [f"{encode_title_for_filename(title, **self.filename_options)}.pdf"
+                                  for title in df['title']]
+        return df.to_dict('records')
+
+    def trigger_download(self, driver, record):
+        """在已加载的页面上触发下载（点击下载按钮等），失败时抛出 DownloadError"""
+        raise NotImplementedError
+
+    def leftover_pdf(self, download_dir):
+        """等待超时后下载目录中遗留的PDF（独立下载目录中的文件只可能属于本次下载），没有时返回 None"""
+        return None
+
+    @contextmanager
+    def fetch(self, context, record, url):
+        driver, download_dir = context
+        watcher = None
+        task_dir = None
+        try:
+            try:
+                driver.get(url)
+                print("✓ 页面访问成功")
+            except Exception as e:
+                raise DownloadError(f"页面访问失败: {e}") from None
+
+            # 等待页面加载完成
+            with timed(self.stats, 'page_load'):
+                if not wait_for_page_ready(driver, self.page_timeout):
+                    print(f"页面在{self.page_timeout}秒内未加载完成，继续查找下载按钮...")
+            self.stats.record_memory(page_memory_mb(driver))
+
+            # 本次下载使用独立的下载目录，其中出现的PDF只属于这篇论文（不支持时退回清理共享目录）
+            task_dir = TaskDownloadDir(driver, download_dir)
+            # 在点击下载按钮之前开始监听下载目录
+            watcher = DownloadWatcher(task_dir.path, driver, ignore_existing=False)
+
+            self.trigger_download(driver, record)
+
+            print("等待文件下载完成...")
+            with timed(self.stats, 'download'):
+                downloaded_file = wait_for_download_complete(task_dir.path, self.download_timeout, watcher)
+            if not downloaded_file:
+                downloaded_file = self.leftover_pdf(task_dir.path)
+                if not downloaded_file:
+                    raise DownloadError("下载超时或失败")
+            print(f"✓ 找到下载的文件: {downloaded_file}")
+            yield os.path.join(task_dir.path, downloaded_file)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            if task_dir is not None:
+                task_dir.close()
+            self.stats.paper_done()
@@ -1,53 +1,146 @@
 import pandas as pd
 import re
+import time
 
-def filter_comments(file_path, save_path=None):
+from csv_stream import stream_filter_csv
+from result_cache import DEFAULT_CACHE_DIR, cached_filter
+
+# 默认年份范围：2022–2025，匹配其后两位 22/23/24/25
+DEFAULT_YEAR_RANGE = (2022, 2025)
+
+ARXIV_PREFIX = 'arxiv:'
+ARXIV_REFERENCE = re.compile(r'arxiv:\s*\d+')
+
+
+def year_pattern(year_range=DEFAULT_YEAR_RANGE):
     """
-    从CSV文件中筛选符合条件的comment，并返回DataFrame。
-    
-    条件：
-    - 包含 accept / publish / appear（子串匹配）
-    - 或：包含 22/23/24/25，但：
-        × 后面不能跟 pages/figures
-        × 不能只出现在 arxiv 引用中（如 arxiv:2310.12345）
+    根据年份范围生成匹配年份后两位的正则，例如 (2022, 2025) -> (22|23|24|25)
     """
-    df_all = pd.read_csv(file_path, encoding = 'utf-8')
-    df_all['comment'] = df_all['comment'].astype(str).str.lower()
+    start, end = year_range
+    suffixes = dict.fromkeys(f"{year % 100:02d}" for year in range(start, end + 1))
+    return '(' + '|'.join(suffixes) + ')'
 
-    # 条件1：包含 accept / publish / appear
-    condition1 = df_all['comment'].str.contains(r'accept|publish|appear')
 
-    # 条件2：包含 22–25，且不是出现在 arxiv 引用中，且后面不是 pages/figures
-    def match_condition2(comment):
-        # 快速检测是否包含目标数字
-        if not re.search(r'(22|23|24|25)', comment):
-            return False
+def match_condition2(comment, year_range=DEFAULT_YEAR_RANGE):
+    """
+    条件2的逐行参考实现（filter_comments 已改为向量化实现，此函数用于基准对比和结果校验）
+    """
+    years = year_pattern(year_range)
+    # 快速检测是否包含目标数字
+    if not re.search(years, comment):
+        return False
+
+    # 1. 排除 pages / figures 的跟随
+    if re.search(years + r'\s*(pages|figures)', comment):
+        return False
+
+    # 2. 提取所有 arxiv 引用（如 arxiv:2310.12345）
+    arxiv_matches = re.findall(r'arxiv:\s*\d+', comment)
+    numbers_in_arxiv = set()
+    for m in arxiv_matches:
+        nums = re.findall(years, m)
+        numbers_in_arxiv.update(nums)
+
+    # 3. 查找出现在整段 comment 中的目标数字
+    all_numbers_in_text = set(re.findall(years, comment))
+
+    # 4. 如果所有命中的数字都只出现在 arxiv 引用中 → 排除
+    if all_numbers_in_text.issubset(numbers_in_arxiv):
+        return False
+
+    # 保留其余情况
+    return True
+
+
+def comment_year_condition(comments, year_range=DEFAULT_YEAR_RANGE):
+    """
+    条件2的向量化实现，语义与 match_condition2 相同：
+    包含目标年份数字，后面不跟 pages/figures，且至少有一个命中的数字不只出现在 arxiv 引用中。
+
+    Args:
+        comments (pd.Series): 已转为小写的 comment 列。
+        year_range (tuple): 年份范围（含两端）。
+    """
+    years = re.compile(year_pattern(year_range).replace('(', '(?:', 1))
+    years_then_pages = re.compile(years.pattern + r'\s*(?:pages|figures)')
+
+    has_year = comments.str.contains(years, na=False)
+    followed_by_pages = comments.str.contains(years_then_pages, na=False)
+    candidates = has_year & ~followed_by_pages
+
+    # 不含 arxiv 引用的候选行直接保留，只有含 arxiv: 的少数行需要比较数字集合
+    has_arxiv = comments.str.contains(ARXIV_PREFIX, regex=False, na=False)
+    keep = (candidates & ~has_arxiv).to_numpy(copy=True)
+
+    with_arxiv = comments[candidates & has_arxiv].reset_index(drop=True)
+    if with_arxiv.empty:
+        return keep
 
-        # 1. 排除 pages / figures 的跟随
-        if re.search(r'(22|23|24|25)\s*(pages|figures)', comment):
-            return False
+    # 所有命中的数字：(行号, 数字)
+    in_text = with_arxiv.str.findall(years).explode().dropna()
+    in_text = pd.DataFrame({'row': in_text.index, 'number': in_text.to_numpy()}).drop_duplicates()
 
-        # 2. 提取所有 arxiv 引用（如 arxiv:2310.12345）
-        arxiv_matches = re.findall(r'arxiv:\s*\d+', comment)
-        numbers_in_arxiv = set()
-        for m in arxiv_matches:
-            nums = re.findall(r'(22|23|24|25)', m)
-            numbers_in_arxiv.update(nums)
+    # arxiv 引用中的数字：(行号, 数字)
+    in_arxiv = with_arxiv.str.findall(ARXIV_REFERENCE).explode().dropna()
+    in_arxiv = in_arxiv.str.findall(years).explode().dropna()
+    in_arxiv = pd.DataFrame({'row': in_arxiv.index, 'number': in_arxiv.to_numpy()}).drop_duplicates()
 
-        # 3. 查找出现在整段 comment 中的 22~25
-        all_numbers_in_text = set(re.findall(r'(22|23|24|25)', comment))
+    # 只要有一个数字不在 arxiv 引用中出现 → 保留
+    merged = in_text.merge(in_arxiv, on=['row', 'number'], how='left', indicator=True)
+    keep_rows = merged.loc[merged['_merge'] == 'left_only', 'row'].unique()
+    positions = (candidates & has_arxiv).to_numpy().nonzero()[0]
+    keep[positions[keep_rows.astype(int)]] = True
+    return keep
 
-        # 4. 如果所有命中的数字都只出现在 arxiv 引用中 → 排除
-        if all_numbers_in_text.issubset(numbers_in_arxiv):
-            return False
 
-        # 保留其余情况
-        return True
+def _lower_comments(df):
+    df['comment'] = df['comment'].astype(str).str.lower()
+    return df
 
-    condition2 = df_all['comment'].apply(match_condition2)
+
+def comment_mask(df, year_range=DEFAULT_YEAR_RANGE):
+    """
+    返回 comment 已小写化的 DataFrame 中满足筛选条件的行
+    """
+    # 条件1：包含 accept / publish / appear
+    condition1 = df['comment'].str.contains(r'accept|publish|appear')
+
+    # 条件2：包含目标年份，且不是出现在 arxiv 引用中，且后面不是 pages/figures
+    condition2 = comment_year_condition(df['comment'], year_range)
 
     # 合并条件
-    df_filtered = df_all[condition1 | condition2]
+    return condition1 | condition2
+
+
+def filter_comments(file_path, save_path=None, year_range=DEFAULT_YEAR_RANGE, chunksize=None,
+                    use_cache=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    从CSV文件中筛选符合条件的comment，并返回DataFrame。
+    
+    条件：
+    - 包含 accept / publish / appear（子串匹配）
+    - 或：包含 year_range 内年份的后两位（默认 22/23/24/25），但：
+        × 后面不能跟 pages/figures
+        × 不能只出现在 arxiv 引用中（如 arxiv:2310.12345）
+
+    chunksize: 指定后以流式模式按块读取并逐块写入 save_path（必须提供），
+               峰值内存与文件大小无关，返回写出的行数而不是DataFrame。
+    use_cache: 复用同一输入、同一条件的上次结果（见 result_cache），输入只追加了新行时只筛选新行。
+    """
+    if use_cache and chunksize is None:
+        start, end = year_range
+        return cached_filter(file_path, f"filter_comments|year_range=({start}, {end})",
+                             lambda df: df[comment_mask(_lower_comments(df), year_range)],
+                             save_path=save_path, cache_dir=cache_dir)
+
+    if chunksize is not None:
+        if not save_path:
+            raise ValueError("流式模式需要指定 save_path")
+        return stream_filter_csv(file_path, save_path, lambda chunk: comment_mask(chunk, year_range),
+                                 chunksize=chunksize, prepare=_lower_comments)
+
+    df_all = _lower_comments(pd.read_csv(file_path, encoding = 'utf-8'))
+    df_filtered = df_all[comment_mask(df_all, year_range)]
 
     if save_path:
         df_filtered.to_csv(save_path, index=False, encoding='utf-8')
@@ -55,6 +148,41 @@ def filter_comments(file_path, save_path=None):
     return df_filtered
 
 
+def benchmark_filter_comments(n_rows=100_000, year_range=DEFAULT_YEAR_RANGE, seed=0):
+    """
+    在合成的 comment 数据上对比逐行实现与向量化实现的耗时，并校验结果一致。
+    """
+    samples = [
+        'accepted at icse 2024',
+        '12 pages, 5 figures',
+        '23 pages, 4 figures, under review',
+        'extended version of arxiv:2310.12345',
+        'see arxiv:2212.01234; camera ready for fse 2025',
+        'to appear in tosem',
+        'nan',
+        'workshop paper, 2023',
+        'code available at github',
+        '25figures and 8 tables',
+    ]
+    comments = pd.Series(samples).sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    comments = comments + ' #' + pd.Series(range(n_rows)).astype(str)
+
+    start = time.perf_counter()
+    row_wise = comments.apply(match_condition2, year_range=year_range)
+    row_wise_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = comment_year_condition(comments, year_range)
+    vectorized_time = time.perf_counter() - start
+
+    assert (row_wise.to_numpy() == vectorized).all(), "向量化结果与逐行实现不一致"
+    print(f"{n_rows} 行: 逐行 {row_wise_time:.3f}s | 向量化 {vectorized_time:.3f}s | 加速 {row_wise_time / vectorized_time:.1f}x")
+    return row_wise_time, vectorized_time
+
+
 
 if __name__ == '__main__':
-    print(filter_comments ('paper_result_no.csv', 'paper_result_no_filter.csv'))
\ No newline at end of file
+    # 基准测试: benchmark_filter_comments(100_000)
+    # 大文件流式筛选: filter_comments('paper_result_no.csv', 'paper_result_no_filter.csv', chunksize=50_000)
+    # 重复运行时复用结果: filter_comments('paper_result_no.csv', 'paper_result_no_filter.csv', use_cache=True)
+    print(filter_comments ('paper_result_no.csv', 'paper_result_no_filter.csv'))
@@ -4,17 +4,19 @@
 from datetime import datetime
 
 from lxml import html
-import requests
 import re
 import math
 import csv
 from bs4 import BeautifulSoup
 import time
 
+from proxy_pool import ProxyPool, build_proxies, proxied_request
+from search_index import update_index
+
 
 def get_total_results(url, headers, params, proxies):
     """一共多少篇文章"""
-    response = requests.get(url, headers=headers, params=params, proxies=proxies)
+    response = proxied_request('GET', url, proxies=proxies, headers=headers, params=params)
     tree = html.fromstring(response.content)
     result_string = ''.join(tree.xpath('//*[@id="main-container"]/div[1]/div[1]/h1/text()')).strip()
     match = re.search(r'of ([\d,]+) results', result_string)
@@ -30,7 +32,7 @@ def get_total_results(url, headers, params, proxies):
 
 def get_paper_info(url, headers, params, proxies):
     """根据URL爬取一页的论文信息"""
-    response = requests.get(url, headers=headers, params=params, proxies=proxies)
+    response = proxied_request('GET', url, proxies=proxies, headers=headers, params=params)
     soup = BeautifulSoup(response.content, 'html.parser')
     papers = []
 
@@ -78,13 +80,18 @@ def save_to_csv(papers, filename):
             writer.writerow(paper)
 
 
-def papers_info_core(keywords, searchtype, page_size, proxies_port):
-    # 设置本地代理
-    proxies = {
-        "http": f"http://127.0.0.1:{proxies_port}",
-        "https": f"http://127.0.0.1:{proxies_port}"
-    } if proxies_port is not None else None
+def papers_info_core(keywords, searchtype, page_size, proxies_port, index_path=None):
+    # 设置本地代理；传入端口列表时使用代理池
+    proxies = build_proxies(proxies_port)
+    try:
+        crawl_papers(keywords, searchtype, page_size, proxies, index_path)
+    finally:
+        # 代理池的健康检查线程随爬取结束而停止
+        if isinstance(proxies, ProxyPool):
+            proxies.stop_health_checks()
+
 
+def crawl_papers(keywords, searchtype, page_size, proxies, index_path=None):
     print(f"搜索关键词: {keywords}")
 
     base_url = "https://arxiv.org/search/"
@@ -115,6 +122,11 @@ def papers_info_core(keywords, searchtype, page_size, proxies_port):
     save_to_csv(all_papers, 'paper_result.csv')
     print(f"完成！总共爬取到 {len(all_papers)} 条论文信息【包含：title、authors、abstract、submission_date、pdf_link】，已保存到 paper_result.csv 文件中。")
 
+    # 增量更新全文检索索引（只写入新增或变化的论文）
+    if index_path is not None:
+        added, updated = update_index(all_papers, index_path)
+        print(f"检索索引已更新: 新增 {added} 篇，更新 {updated} 篇 -> {index_path}")
+
 
 if __name__ == '__main__':
     papers_info_core(keywords="text spotter", searchtype="all", page_size=200, proxies_port=10808)
@@ -0,0 +1,194 @@
+"""
+布尔关键词查询：AND / OR / NOT、括号、"短语"、字段限定（title: abstract: comment: authors: fulltext:）
+
+示例:
+    "large language model" AND (title:review OR abstract:"code review") NOT comment:workshop
+
+- 相邻的词默认以 AND 连接，优先级 NOT > AND > OR
+- 匹配为不区分大小写的子串匹配（与 filter_abstract_by_keyword 一致），短语内的空白视为任意空白
+- fulltext 为 pdf_text 提取的PDF全文，需要先用 attach_full_text 加到表中
+- 每个被引用的字段只读取和小写化一次，所有词在同一份小写文本上做字面搜索，
+  不再为每个词重新读取CSV或做一次不区分大小写的正则扫描；但每个词仍各扫描一遍文本，
+  耗时随词数线性增长，不是一次扫描匹配全部词的多模式匹配（见 match_terms）
+"""
+import re
+
+
+QUERY_FIELDS = ('title', 'abstract', 'comment', 'authors', 'fulltext')
+OPERATORS = ('AND', 'OR', 'NOT')
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<paren>[()])|(?P<field>[A-Za-z_]+):(?=\S)|"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))')
+
+
+def tokenize(query):
+    """将查询字符串切分为 (类型, 值) 记号"""
+    tokens = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = TOKEN_PATTERN.match(query, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"无法解析查询，位置 {pos}: {query[pos:pos + 20]!r}")
+        pos = match.end()
+        if match.group('paren'):
+            tokens.append(('paren', match.group('paren')))
+        elif match.group('field'):
+            tokens.append(('field', match.group('field').lower()))
+        elif match.group('phrase') is not None:
+            tokens.append(('term', match.group('phrase')))
+        else:
+            word = match.group('word')
+            tokens.append(('op', word) if word in OPERATORS else ('term', word))
+    return tokens
+
+
+class _Parser:
+    """递归下降解析器，生成嵌套元组形式的语法树：
+    ('term', 字段, 词) / ('not', 子树) / ('and', 左, 右) / ('or', 左, 右)
+    """
+
+    def __init__(self, tokens, default_fields):
+        self.tokens = tokens
+        self.pos = 0
+        self.default_fields = default_fields
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("查询为空")
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"查询中存在多余的记号: {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ('op', 'OR'):
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while True:
+            kind, value = self.peek()
+            if (kind, value) == ('op', 'AND'):
+                self.take()
+            elif kind in ('term', 'field') or (kind, value) in (('paren', '('), ('op', 'NOT')):
+                pass  # 隐式 AND
+            else:
+                return node
+            node = ('and', node, self.parse_not())
+
+    def parse_not(self):
+        if self.peek() == ('op', 'NOT'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self, fields=None):
+        kind, value = self.take()
+        if kind == 'paren' and value == '(':
+            node = self.parse_or() if fields is None else self._scoped(fields)
+            if self.take() != ('paren', ')'):
+                raise ValueError("括号不匹配")
+            return node
+        if kind == 'field':
+            if value not in QUERY_FIELDS:
+                raise ValueError(f"未知字段 '{value}'，可选: {QUERY_FIELDS}")
+            return self.parse_atom(fields=(value,))
+        if kind == 'term':
+            return self._term(fields or self.default_fields, value)
+        raise ValueError(f"查询语法错误，意外的记号: {value!r}")
+
+    def _scoped(self, fields):
+        # field:(a OR b) 将括号内的默认字段替换为该字段
+        saved, self.default_fields = self.default_fields, fields
+        try:
+            return self.parse_or()
+        finally:
+            self.default_fields = saved
+
+    @staticmethod
+    def _term(fields, text):
+        text = ' '.join(text.lower().split())
+        if not text:
+            raise ValueError("查询中存在空短语")
+        node = None
+        for field in fields:
+            leaf = ('term', field, text)
+            node = leaf if node is None else ('or', node, leaf)
+        return node
+
+
+def parse_query(query, default_fields=('abstract',)):
+    """解析查询字符串，返回语法树"""
+    return _Parser(tokenize(query), tuple(default_fields)).parse()
+
+
+def query_terms(tree):
+    """返回语法树中所有 (字段, 词)"""
+    if tree[0] == 'term':
+        return {(tree[1], tree[2])}
+    return set().union(*(query_terms(child) for child in tree[1:]))
+
+
+def normalize_text(series):
+    """小写化一列文本；每个字段只做一次，供该字段的所有词共用"""
+    return series.fillna('').astype(str).str.lower()
+
+
+def match_terms(texts, terms):
+    """
+    在已小写化的一列文本上匹配一组词，返回 {词: 布尔数组}。
+    单词使用C层面的字面子串搜索；短语的词之间允许任意空白。
+    每个词各扫描一遍文本。合并为一个正则（所有词的 | 分支，用前瞻捕获重叠的词）一次扫描，
+    或逐行用 Aho-Corasick 自动机（pyahocorasick）匹配，在5万条摘要、30个词时分别慢约3倍和2倍，
+    Aho-Corasick 到约100个词才持平，因此保留逐词的字面扫描。
+    """
+    result = {}
+    for term in set(terms):
+        if ' ' in term:
+            pattern = re.compile(r'\s+'.join(re.escape(word) for word in term.split(' ')))
+            matched = texts.str.contains(pattern, na=False)
+        else:
+            matched = texts.str.contains(term, regex=False, na=False)
+        result[term] = matched.to_numpy(dtype=bool)
+    return result
+
+
+def evaluate(tree, leaf_values):
+    """在 {(字段, 词): 布尔数组} 上求值语法树"""
+    kind = tree[0]
+    if kind == 'term':
+        return leaf_values[(tree[1], tree[2])]
+    if kind == 'not':
+        return ~evaluate(tree[1], leaf_values)
+    left, right = evaluate(tree[1], leaf_values), evaluate(tree[2], leaf_values)
+    return left & right if kind == 'and' else left | right
+
+
+def query_mask(df, query, default_fields=('abstract',)):
+    """
+    计算 DataFrame 中满足查询的行，返回布尔数组。
+    每个被引用的字段只做一次小写化，查询中的所有词共用这份文本。
+    """
+    tree = parse_query(query, default_fields) if isinstance(query, str) else query
+    terms_by_field = {}
+    for field, term in query_terms(tree):
+        terms_by_field.setdefault(field, set()).add(term)
+
+    leaf_values = {}
+    for field, terms in terms_by_field.items():
+        if field not in df.columns:
+            raise KeyError(f"CSV文件中缺少 '{field}' 列")
+        for term, values in match_terms(normalize_text(df[field]), terms).items():
+            leaf_values[(field, term)] = values
+    return evaluate(tree, leaf_values)
@@ -1,42 +1,179 @@
 import os
 import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
-def filter_abstract_by_keyword(input_csv, keyword, output_csv):
+from csv_stream import stream_filter_csv
+from keyword_query import parse_query, query_mask
+from pdf_library import PdfLibrary
+from pdf_text import attach_full_text
+from result_cache import DEFAULT_CACHE_DIR, cached_filter
+
+# Linux ioctl: 在支持的文件系统(btrfs/xfs等)上创建共享数据块的副本
+FICLONE = 0x40049409
+
+def filter_abstract_by_keyword(input_csv, keyword, output_csv, chunksize=None, use_cache=False, cache_dir=DEFAULT_CACHE_DIR):
     """
     从 input_csv 中筛选 abstract 含 keyword 的行，并保存为 output_csv。
+    chunksize: 指定后按块流式读取并逐块写出，返回写出的行数而不是DataFrame。
+    use_cache: 复用同一输入、同一关键词的上次结果（见 result_cache）。
     """
+    if use_cache and chunksize is None:
+        filtered_df = cached_filter(input_csv, f"abstract_contains|{keyword}",
+                                    lambda df: df[df['abstract'].str.contains(keyword, case=False, na=False)],
+                                    save_path=output_csv, cache_dir=cache_dir)
+        print(f"[INFO] 已筛选出 {len(filtered_df)} 行，保存为 '{output_csv}'")
+        return filtered_df
+
+    if chunksize is not None:
+        count = stream_filter_csv(input_csv, output_csv,
+                                  lambda chunk: chunk['abstract'].str.contains(keyword, case=False, na=False),
+                                  chunksize=chunksize)
+        print(f"[INFO] 已筛选出 {count} 行，保存为 '{output_csv}'")
+        return count
+
     df = pd.read_csv(input_csv, encoding='utf-8')
     filtered_df = df[df['abstract'].str.contains(keyword, case=False, na=False)]
     filtered_df.to_csv(output_csv, index=False)
     print(f"[INFO] 已筛选出 {len(filtered_df)} 行，保存为 '{output_csv}'")
     return filtered_df
 
-def copy_selected_pdfs(filtered_df, source_dir, target_dir):
+def filter_by_query(input_csv, query, output_csv, default_fields=('abstract',), chunksize=None,
+                    use_cache=False, cache_dir=DEFAULT_CACHE_DIR, text_store=None):
+    """
+    从 input_csv 中筛选满足布尔查询的行，并保存为 output_csv。
+    查询语法见 keyword_query，例如：
+        '"large language model" AND (title:review OR comment:accepted) NOT survey'
+    未指定字段的词在 default_fields 中匹配（任一字段命中即可）。
+    chunksize: 指定后按块流式读取并逐块写出，返回写出的行数而不是DataFrame。
+    use_cache: 复用上次结果；缓存键使用解析后的语法树，书写不同但等价的查询（大小写、空白）共用缓存。
+    text_store: pdf_text 的文本库路径；指定后可以使用 fulltext 字段在PDF全文中检索
+                （如 'fulltext:"threats to validity"'，或 default_fields=('abstract', 'fulltext')）。
+                输出文件不包含全文列。
+    """
+    def mask(df):
+        if text_store is None:
+            return query_mask(df, tree)
+        return query_mask(attach_full_text(df, text_store), tree)
+
+    tree = parse_query(query, default_fields)
+    if use_cache and chunksize is None:
+        # 文本库更新后缓存随之失效
+        store_version = f"|{os.path.abspath(text_store)}@{os.path.getmtime(text_store)}" if text_store else ""
+        filtered_df = cached_filter(input_csv, f"query|{tree!r}{store_version}", lambda df: df[mask(df)],
+                                    save_path=output_csv, cache_dir=cache_dir)
+        print(f"[INFO] 查询 {query!r} 筛选出 {len(filtered_df)} 行，保存为 '{output_csv}'")
+        return filtered_df
+
+    if chunksize is not None:
+        count = stream_filter_csv(input_csv, output_csv, mask, chunksize=chunksize)
+        print(f"[INFO] 查询 {query!r} 筛选出 {count} 行，保存为 '{output_csv}'")
+        return count
+
+    df = pd.read_csv(input_csv, encoding='utf-8')
+    filtered_df = df[mask(df)]
+    filtered_df.to_csv(output_csv, index=False)
+    print(f"[INFO] 查询 {query!r} 筛选出 {len(filtered_df)} 行，保存为 '{output_csv}'")
+    return filtered_df
+
+def index_pdfs_by_no(source_dir, nos=None):
+    """
+    通过 source_dir 的路径索引（见 pdf_library）返回 {no: [完整路径, ...]}，文件名格式为 no_year_title.pdf。
+    支持分片布局；只读打开，不创建目录也不写索引文件。
+    索引中 nos（默认全部编号）对应的文件会逐个核对是否仍在磁盘上：有文件已删除，
+    或有编号不在索引中（可能是手动放入的文件）时，扫描一次目录，以磁盘上的实际文件为准。
+    """
+    library = PdfLibrary(source_dir, read_only=True)
+    index = {str(no): paths for no, paths in library.files_by_no().items()}
+    wanted = index.keys() if nos is None else nos
+    if any(no not in index or not all(os.path.isfile(path) for path in index[no]) for no in wanted):
+        library.rebuild_index()
+        index = {str(no): paths for no, paths in library.files_by_no().items()}
+    return index
+
+def link_or_copy(src, dst, use_links=True):
+    """
+    优先使用硬链接（同一文件系统时不复制数据），失败则尝试 reflink（copy-on-write），
+    最后退回普通复制。返回实际使用的方式。
+    注意硬链接与源文件共享内容，修改其一会影响另一个；需要独立副本时传 use_links=False。
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    if use_links:
+        try:
+            os.link(src, dst)
+            return 'link'
+        except OSError:
+            pass
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return 'reflink'
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(src, dst)
+    return 'copy'
+
+def write_missing_manifest(missing, manifest_path):
+    """
+    将未找到PDF的编号写入清单（每行一个编号），可直接传给 papers_file_core(specific_nos_list=manifest_path)。
+    """
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        for no in missing:
+            f.write(f"{no}\n")
+
+def copy_selected_pdfs(filtered_df, source_dir, target_dir, max_workers=8, missing_manifest='missing_nos.txt', use_links=True):
     """
     根据 filtered_df 中的 'no' 列，从 source_dir 拷贝匹配的 PDF 文件到 target_dir。
+    filtered_df 也可以是筛选结果CSV的路径（流式模式的输出），此时只读取 'no' 列。
+
+    source_dir 中的文件通过路径索引按编号定位（支持分片布局，索引与磁盘不一致时重新扫描）；文件优先以硬链接/reflink
+    方式放入 target_dir，无法链接时使用线程池并行复制。未找到或复制失败的编号写入 missing_manifest（为 None 时不写）。
     """
     os.makedirs(target_dir, exist_ok=True)
 
-    no_list = filtered_df['no'].astype(str).tolist()
-    copied = 0
-    missing = []
+    if isinstance(filtered_df, (str, os.PathLike)):
+        filtered_df = pd.read_csv(filtered_df, usecols=['no'], encoding='utf-8')
 
+    no_list = filtered_df['no'].dropna().map(lambda no: str(int(no)) if isinstance(no, float) else str(no)).tolist()
+    index = index_pdfs_by_no(source_dir, no_list)
+
+    files = []
+    missing = []
     for no in no_list:
-        matched_files = [f for f in os.listdir(source_dir) if f.startswith(no + "_") and f.endswith(".pdf")]
-
-        if matched_files:
-            for file in matched_files:
-                src = os.path.join(source_dir, file)
-                dst = os.path.join(target_dir, file)
-                shutil.copyfile(src, dst)
-                copied += 1
+        if no in index:
+            files.extend((no, path) for path in index[no])
         else:
             missing.append(no)
 
-    print(f"[INFO] 成功复制 {copied} 个 PDF 文件到 '{target_dir}'")
+    def transfer(item):
+        no, path = item
+        try:
+            return link_or_copy(path, os.path.join(target_dir, os.path.basename(path)), use_links)
+        except OSError as e:
+            # 扫描之后文件又被删除或无法读取时记为缺失，不中断其他文件的复制
+            print(f"[WARNING] 无法复制 '{path}': {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(transfer, files))
+    methods = Counter(method for method in results if method)
+    failed = {no for (no, _), method in zip(files, results) if method is None}
+    copied = {no for (no, _), method in zip(files, results) if method}
+    # 同一编号有多个文件时，只要有一个复制成功就不算缺失
+    missing.extend(no for no in dict.fromkeys(no for no, _ in files) if no in failed and no not in copied)
+
+    print(f"[INFO] 成功复制 {sum(methods.values())} 个 PDF 文件到 '{target_dir}'"
+          f"（硬链接 {methods['link']}，reflink {methods['reflink']}，复制 {methods['copy']}）")
     if missing:
         print(f"[WARNING] 有 {len(missing)} 个编号未找到匹配的 PDF，例如：{missing[:5]}")
+        if missing_manifest:
+            write_missing_manifest(missing, missing_manifest)
+            print(f"[INFO] 缺失编号已写入 '{missing_manifest}'，可用 papers_file_core(specific_nos_list='{missing_manifest}') 补下载")
+    return missing
 
 def main():
     input_csv = 'paper_result_no_filter.csv'
@@ -46,8 +183,14 @@ def main():
     target_dir = 'selected_pdfs'
 
     # 步骤 1：过滤含关键词的行并保存
+    # 多个关键词组合可使用布尔查询，例如：
+    # filtered_df = filter_by_query(input_csv, '"empirical stud" AND (title:LLM OR "large language model")', output_csv)
     filtered_df = filter_abstract_by_keyword(input_csv, keyword, output_csv)
 
+    # 大文件可使用流式模式，再按筛选结果文件复制：
+    # filter_abstract_by_keyword(input_csv, keyword, output_csv, chunksize=50_000)
+    # copy_selected_pdfs(output_csv, source_dir, target_dir)
+
     # 步骤 2：根据 no 字段复制 PDF
     copy_selected_pdfs(filtered_df, source_dir, target_dir)
 
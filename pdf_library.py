@@ -0,0 +1,293 @@
+"""
+PDF 库的目录布局与路径索引
+
+- flat: 所有文件放在根目录（默认，兼容已有目录）
+- year: 按 no_year_title.pdf 中的年份分子目录，如 2024/123_2024_title.pdf（无年份的放在 unknown/）
+- hash: 按文件名 md5 前两位分为 256 个子目录，如 a3/123_2024_title.pdf（适合 EBSCO/INFORMS 等无编号的文件名）
+
+布局记录在库根目录的 .library.json；文件位置记录在 .pdf_index.csv（下载后追加写入），
+各工具通过索引定位文件，不再逐个列目录。
+
+用法:
+    uv run pdf_library.py migrate downloaded_pdfs --layout year
+    uv run pdf_library.py reindex downloaded_pdfs
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+LAYOUTS = ('flat', 'year', 'hash')
+LAYOUT_FILE = '.library.json'
+INDEX_FILE = '.pdf_index.csv'
+
+# no_year_title.pdf 中的 no
+PDF_NO_PATTERN = re.compile(r'^(\d+)_.*\.pdf$', re.IGNORECASE)
+
+
+def file_no(file_name):
+    """返回 no_year_title.pdf 格式文件名中的编号，不符合格式时返回 None"""
+    match = PDF_NO_PATTERN.match(file_name)
+    return int(match.group(1)) if match else None
+
+
+def shard_dir(file_name, layout):
+    """文件在给定布局下所在的子目录（相对库根目录），flat 布局为空字符串"""
+    if layout == 'flat':
+        return ''
+    if layout == 'year':
+        parts = file_name.split('_', 2)
+        return parts[1] if len(parts) == 3 and parts[1].isdigit() else 'unknown'
+    if layout == 'hash':
+        return hashlib.md5(file_name.encode('utf-8')).hexdigest()[:2]
+    raise ValueError(f"未知的目录布局: {layout}，可选 {LAYOUTS}")
+
+
+def _read_layout(root):
+    try:
+        with open(os.path.join(root, LAYOUT_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get('layout')
+    except (OSError, ValueError):
+        return None
+
+
+def _write_layout(root, layout):
+    with open(os.path.join(root, LAYOUT_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'layout': layout}, f)
+
+
+def _has_root_pdfs(root):
+    with os.scandir(root) as entries:
+        return any(entry.name.lower().endswith('.pdf') and entry.is_file() for entry in entries)
+
+
+class PdfLibrary:
+    """
+    一个 PDF 目录：按布局计算文件路径，并维护 文件名 -> (相对路径, 字节数) 的索引。
+    layout 为 None 时使用目录中记录的布局（没有记录则为 flat）。
+    read_only=True 供只读工具（检查、全文提取、拷贝）使用：不创建目录，不写布局文件和索引文件，
+    索引的变化只保存在内存中；这些工具应先调用 rebuild_index() 以磁盘上的实际文件为准。
+    """
+
+    def __init__(self, root, layout=None, read_only=False):
+        self.root = root
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(root, exist_ok=True)
+        stored = _read_layout(root)
+        if layout is None:
+            layout = stored or 'flat'
+        if layout not in LAYOUTS:
+            raise ValueError(f"未知的目录布局: {layout}，可选 {LAYOUTS}")
+        if stored is None and layout != 'flat' and not read_only:
+            if _has_root_pdfs(root):
+                raise ValueError(f"'{root}' 中已有平铺的PDF，请先运行: uv run pdf_library.py migrate {root} --layout {layout}")
+            _write_layout(root, layout)
+        elif stored is not None and stored != layout:
+            raise ValueError(f"'{root}' 使用 {stored} 布局，请先运行: uv run pdf_library.py migrate {root} --layout {layout}")
+        self.layout = layout
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def relative_path(self, file_name):
+        return os.path.join(shard_dir(file_name, self.layout), file_name)
+
+    def path_for(self, file_name):
+        """文件在本库中的完整路径（不检查是否存在）"""
+        return os.path.join(self.root, self.relative_path(file_name))
+
+    @property
+    def index(self):
+        """文件名 -> (相对路径, 字节数)；索引文件不存在时扫描目录重建"""
+        if self._index is None:
+            if os.path.exists(self.index_path):
+                self._index = self._load_index()
+            else:
+                self.rebuild_index()
+        return self._index
+
+    def _load_index(self):
+        # 索引只追加，后写的行覆盖先写的；相对路径为空表示文件已删除
+        index = {}
+        malformed = False
+        try:
+            with open(self.index_path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    # 追加被中断时会留下不完整的行
+                    if len(row) != 3 or not row[2].isdigit():
+                        malformed = True
+                        continue
+                    name, rel_path, size = row
+                    if rel_path:
+                        index[name] = (rel_path, int(size))
+                    else:
+                        index.pop(name, None)
+        except (csv.Error, UnicodeDecodeError) as e:
+            print(f"[WARN] 索引文件 '{self.index_path}' 无法读取 ({e})，扫描目录重建")
+            return self.rebuild_index()
+        if malformed:
+            # 重写索引，去掉不完整的行，之后追加的行不会接在残行后面
+            print(f"[WARN] 索引文件 '{self.index_path}' 中有不完整的行，已忽略")
+            if not self.read_only:
+                self._write_index(index)
+        return index
+
+    def _write_index(self, index):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows((name, rel_path, size) for name, (rel_path, size) in index.items())
+        os.replace(tmp_path, self.index_path)
+
+    def rebuild_index(self):
+        """扫描库目录（含分片子目录）重写索引（只读时不写文件），返回新索引"""
+        index = {}
+        if self.read_only and not os.path.isdir(self.root):
+            with self._lock:
+                self._index = index
+            return index
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    with os.scandir(entry.path) as sub_entries:
+                        for sub_entry in sub_entries:
+                            if sub_entry.name.lower().endswith('.pdf') and sub_entry.is_file():
+                                index[sub_entry.name] = (os.path.join(entry.name, sub_entry.name), sub_entry.stat().st_size)
+                elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                    index[entry.name] = (entry.name, entry.stat().st_size)
+
+        if not self.read_only:
+            self._write_index(index)
+        with self._lock:
+            self._index = index
+        return index
+
+    def _append(self, name, rel_path, size):
+        with self._lock:
+            if not self.read_only:
+                with open(self.index_path, 'a', newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerow((name, rel_path, size))
+            if self._index is not None:
+                if rel_path:
+                    self._index[name] = (rel_path, size)
+                else:
+                    self._index.pop(name, None)
+
+    def record(self, file_name):
+        """文件写入 path_for(file_name) 后调用，把它加入索引（线程安全）"""
+        self.index  # 先加载已有索引，追加的行才不会被之后的加载覆盖
+        self._append(file_name, self.relative_path(file_name), os.path.getsize(self.path_for(file_name)))
+
+    def forget(self, file_name):
+        """从索引中移除文件（不删除文件本身）"""
+        self.index  # 同 record
+        self._append(file_name, '', 0)
+
+    def existing(self, file_names):
+        """
+        返回 file_names 中库里确实存在的文件名集合：有索引记录的文件须仍在磁盘上且大小与索引一致，
+        不一致的（已删除或被截断）从索引中移除；没有索引记录的按路径检查，存在的补入索引。
+        """
+        found = set()
+        for name in file_names:
+            entry = self.index.get(name)
+            path = os.path.join(self.root, entry[0]) if entry else self.path_for(name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            if entry is None:
+                if size:
+                    self.record(name)
+                    found.add(name)
+            elif size == entry[1]:
+                found.add(name)
+            else:
+                self.forget(name)
+        return found
+
+    def entries(self):
+        """按索引返回 [(文件名, 完整路径, 字节数)]"""
+        return [(name, os.path.join(self.root, rel_path), size) for name, (rel_path, size) in self.index.items()]
+
+    def files_by_no(self):
+        """按索引返回 {no: [完整路径, ...]}，只包含 no_year_title.pdf 格式的文件"""
+        by_no = {}
+        for name, (rel_path, _) in self.index.items():
+            no = file_no(name)
+            if no is not None:
+                by_no.setdefault(no, []).append(os.path.join(self.root, rel_path))
+        return by_no
+
+
+def migrate_library(root, layout):
+    """
+    将已有目录（任意布局）迁移到新布局：同一文件系统内按文件重命名，不复制数据。
+    完成后记录新布局、删除空的旧分片目录并重建索引。
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的目录布局: {layout}，可选 {LAYOUTS}")
+    start = time.perf_counter()
+    old_layout = _read_layout(root) or 'flat'
+    index = PdfLibrary(root, old_layout).rebuild_index()
+
+    moved = 0
+    created = set()
+    for name, (rel_path, _) in index.items():
+        new_rel_path = os.path.join(shard_dir(name, layout), name)
+        if new_rel_path == rel_path:
+            continue
+        new_dir = os.path.dirname(new_rel_path)
+        if new_dir and new_dir not in created:
+            os.makedirs(os.path.join(root, new_dir), exist_ok=True)
+            created.add(new_dir)
+        os.replace(os.path.join(root, rel_path), os.path.join(root, new_rel_path))
+        moved += 1
+
+    _write_layout(root, layout)
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir() and not entry.name.startswith('.'):
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass
+
+    library = PdfLibrary(root, layout)
+    library.rebuild_index()
+    print(f"[INFO] '{root}' 已从 {old_layout} 迁移到 {layout} 布局：移动 {moved} 个文件，"
+          f"共 {len(library.index)} 个，用时 {time.perf_counter() - start:.2f}s")
+    return library
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 库目录布局迁移与索引")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="迁移到新的目录布局")
+    migrate_parser.add_argument('root', help="PDF 目录，如 downloaded_pdfs")
+    migrate_parser.add_argument('--layout', choices=LAYOUTS, required=True)
+
+    reindex_parser = subparsers.add_parser('reindex', help="扫描目录重建索引（手动增删文件后使用）")
+    reindex_parser.add_argument('root', help="PDF 目录，如 downloaded_pdfs")
+
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        migrate_library(args.root, args.layout)
+    else:
+        library = PdfLibrary(args.root)
+        library.rebuild_index()
+        print(f"[INFO] '{args.root}' ({library.layout}) 索引已重建，共 {len(library.index)} 个文件")
+
+
+if __name__ == '__main__':
+    main()
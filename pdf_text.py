@@ -0,0 +1,203 @@
+"""
+PDF 全文提取：在 papers_file_core 下载之后，用进程池并行提取 PDF 文本并持久化
+
+- 文本按 PDF 内容的 sha256 存储（zlib 压缩，SQLite），同一内容的文件只提取一次
+- 文件大小和修改时间未变的 PDF 直接跳过，不重新读取
+- 提取失败的内容也会记录，避免每次重试；force=True 时重新提取
+- 需要 PyMuPDF（优先，速度快）或 pypdf 之一: uv add pymupdf
+
+用法:
+    uv run pdf_text.py downloaded_pdfs
+提取后可在关键词筛选中使用 fulltext 字段:
+    filter_by_query('paper_result_no.csv', 'fulltext:"threats to validity"', 'out.csv', text_store='pdf_text.sqlite')
+"""
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from tqdm import tqdm
+
+from pdf_library import PdfLibrary, file_no
+
+DEFAULT_TEXT_STORE = "pdf_text.sqlite"
+FULL_TEXT_COLUMN = 'fulltext'
+# load_full_text 每次查询的编号数（低于 SQLite 的参数个数上限）
+LOAD_BATCH_SIZE = 500
+
+# 子进程中已提取过的内容哈希，由进程池 initializer 设置
+_known_hashes = frozenset()
+
+
+def pdf_backend():
+    """返回可用的 PDF 解析库名称，都未安装时抛出 ImportError"""
+    try:
+        import fitz  # noqa: F401
+        return 'pymupdf'
+    except ImportError:
+        pass
+    try:
+        import pypdf  # noqa: F401
+        return 'pypdf'
+    except ImportError:
+        raise ImportError("提取PDF文本需要安装 PyMuPDF 或 pypdf，例如: uv add pymupdf") from None
+
+
+def extract_pdf_text(data):
+    """从 PDF 字节中提取文本，返回 (文本, 页数)"""
+    if pdf_backend() == 'pymupdf':
+        import fitz
+        with fitz.open(stream=data, filetype='pdf') as doc:
+            return '\n'.join(page.get_text() for page in doc), doc.page_count
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages), len(reader.pages)
+
+
+def _init_worker(known_hashes):
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def _extract_worker(path):
+    """子进程：读取文件、计算哈希，内容未提取过时提取文本。返回 (path, sha256, 压缩文本, 页数, 错误)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest in _known_hashes:
+        return path, digest, None, None, None
+    try:
+        text, pages = extract_pdf_text(data)
+        return path, digest, zlib.compress(text.encode('utf-8')), pages, None
+    except Exception as e:
+        return path, digest, None, None, f"{type(e).__name__}: {e}"
+
+
+def open_text_store(store_path=DEFAULT_TEXT_STORE):
+    """打开（必要时创建）文本库"""
+    conn = sqlite3.connect(store_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS texts (
+            sha256 TEXT PRIMARY KEY,
+            text BLOB,
+            pages INTEGER,
+            error TEXT
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            name TEXT PRIMARY KEY,
+            no INTEGER,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_no ON files (no);
+    """)
+    return conn
+
+
+def papers_text_core(pdf_dir="downloaded_pdfs", store_path=DEFAULT_TEXT_STORE, max_workers=None, force=False):
+    """
+    提取 pdf_dir 中所有 PDF 的文本写入 store_path。
+    max_workers 默认为 CPU 核数；force=True 时忽略已有结果重新提取。
+    返回 (新提取数, 复用数, 失败数)。
+    """
+    backend = pdf_backend()
+    start = time.perf_counter()
+    # 只读扫描目录，包括手动放入的文件，不创建目录也不写索引文件
+    library = PdfLibrary(pdf_dir, read_only=True)
+    library.rebuild_index()
+    conn = open_text_store(store_path)
+    try:
+        seen = {name: (size, mtime) for name, size, mtime in conn.execute("SELECT name, size, mtime FROM files")}
+        known = frozenset() if force else frozenset(row[0] for row in conn.execute("SELECT sha256 FROM texts"))
+
+        todo = []
+        for name, path, _ in library.entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_size == 0:
+                continue
+            if force or seen.get(name) != (stat.st_size, stat.st_mtime):
+                todo.append((name, path, stat))
+        print(f"[INFO] 共 {len(library.index)} 个PDF，待处理 {len(todo)} 个（{backend}）")
+
+        extracted = reused = failed = 0
+        if todo:
+            by_path = {path: (name, stat) for name, path, stat in todo}
+            max_workers = max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(known,)) as executor:
+                results = executor.map(_extract_worker, list(by_path), chunksize=4)
+                for i, (path, digest, text, pages, error) in enumerate(tqdm(results, desc="提取文本中", ncols=100, total=len(todo))):
+                    name, stat = by_path[path]
+                    if text is not None or error is not None:
+                        conn.execute("INSERT OR REPLACE INTO texts (sha256, text, pages, error) VALUES (?, ?, ?, ?)",
+                                     (digest, text, pages, error))
+                        if error is None:
+                            extracted += 1
+                        else:
+                            failed += 1
+                            print(f"提取失败: {name}: {error}")
+                    else:
+                        reused += 1
+                    conn.execute("INSERT OR REPLACE INTO files (name, no, size, mtime, sha256) VALUES (?, ?, ?, ?, ?)",
+                                 (name, file_no(name), stat.st_size, stat.st_mtime, digest))
+                    if i % 200 == 199:
+                        conn.commit()
+            conn.commit()
+    finally:
+        conn.close()
+
+    print(f"[INFO] 文本提取完成: 新提取 {extracted}，复用 {reused}，失败 {failed}，"
+          f"用时 {time.perf_counter() - start:.2f}s -> '{store_path}'")
+    return extracted, reused, failed
+
+
+def load_full_text(nos=None, store_path=DEFAULT_TEXT_STORE):
+    """
+    返回 {no: 全文}；nos 为 None 时返回全部。同一编号有多个文件时取其一。
+    指定 nos 时按 files.no 索引分批查询（每批 LOAD_BATCH_SIZE 个编号），只读取这些编号的文本，
+    按块筛选时每块的开销与块大小相关，而不是与整个文本库相关。
+    """
+    query = ("SELECT files.no, texts.text FROM files JOIN texts ON files.sha256 = texts.sha256 "
+             "WHERE files.no IS NOT NULL AND texts.text IS NOT NULL")
+    conn = open_text_store(store_path)
+    try:
+        if nos is None:
+            return {no: zlib.decompress(text).decode('utf-8') for no, text in conn.execute(query)}
+        texts = {}
+        nos = sorted(set(nos))
+        for i in range(0, len(nos), LOAD_BATCH_SIZE):
+            batch = nos[i:i + LOAD_BATCH_SIZE]
+            rows = conn.execute(f"{query} AND files.no IN ({','.join('?' * len(batch))})", batch)
+            texts.update((no, zlib.decompress(text).decode('utf-8')) for no, text in rows)
+        return texts
+    finally:
+        conn.close()
+
+
+def attach_full_text(df, store_path=DEFAULT_TEXT_STORE, column=FULL_TEXT_COLUMN):
+    """按 'no' 列为 df 增加全文列（未提取的论文为空），供关键词筛选使用"""
+    nos = pd.to_numeric(df['no'], errors='coerce')
+    texts = load_full_text(set(nos.dropna().astype(int)), store_path)
+    return df.assign(**{column: nos.map(lambda no: texts.get(int(no)) if pd.notna(no) else None)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行提取PDF全文")
+    parser.add_argument('pdf_dir', nargs='?', default="downloaded_pdfs", help="PDF 目录")
+    parser.add_argument('--store', default=DEFAULT_TEXT_STORE, help="文本库路径")
+    parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument('--force', action='store_true', help="忽略已有结果重新提取")
+    args = parser.parse_args()
+    papers_text_core(args.pdf_dir, args.store, args.workers, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+下载来源（provider）接口
+
+每个来源按同样的四步下载一条记录：
+    resolve（记录 -> 下载地址）-> fetch（取得文件）-> validate（检查是否为完整PDF）-> store（放入 PdfLibrary 并记入索引）
+并发、全局节流、失败重试、工作者重启和下载台账由 scheduler.DownloadScheduler 统一负责，所有来源共用。
+
+已有的来源（按名称通过 get_provider 加载）:
+- arxiv: download_from_csv.ArxivHttpProvider，HTTP 下载，可使用代理池
+- ebsco: EBSCO_getpdf.EbscoBrowserProvider，浏览器两步下载
+- informs: INFORMS_getpdf.InformsBrowserProvider，浏览器下载
+- informs-http: INFORMS_getpdf.InformsHybridProvider，浏览器只负责认证，PDF 由 HTTP 直接下载
+"""
+import importlib
+import os
+import shutil
+from contextlib import contextmanager
+
+from pdf_library import PdfLibrary
+
+# 名称 -> (模块, 类名)，按需导入，arXiv 下载不需要安装浏览器相关依赖
+PROVIDERS = {
+    'arxiv': ('download_from_csv', 'ArxivHttpProvider'),
+    'ebsco': ('EBSCO_getpdf', 'EbscoBrowserProvider'),
+    'informs': ('INFORMS_getpdf', 'InformsBrowserProvider'),
+    'informs-http': ('INFORMS_getpdf', 'InformsHybridProvider'),
+}
+
+
+class DownloadError(Exception):
+    """单条记录下载失败，消息为失败原因"""
+
+
+def get_provider(name, **options):
+    """按名称创建来源实例，options 传给其构造函数"""
+    if name not in PROVIDERS:
+        raise ValueError(f"未知的下载来源: {name}，可选 {sorted(PROVIDERS)}")
+    module_name, class_name = PROVIDERS[name]
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+
+class Provider:
+    """
+    下载来源的基类。子类实现 load_records 和 fetch，按需覆盖其他步骤。
+    记录是 dict，至少包含 'title' 和 'pdf_filename'（在 PdfLibrary 中的文件名）。
+    """
+
+    name = ''
+    # 调度器的默认并发数、全局下载间隔（秒）和每条记录的最多尝试次数
+    workers = 1
+    min_interval = 0
+    max_attempts = 2
+    # 连续失败时是否重启工作者（浏览器可能崩溃或会话过期；HTTP 工作者无状态，不需要）
+    restart_on_failures = False
+    # 小于该字节数的文件视为不完整
+    min_size = 1000
+
+    def __init__(self, output_folder, layout=None, workers=None):
+        self.library = PdfLibrary(output_folder, layout)
+        if workers:
+            self.workers = workers
+
+    def load_records(self, source, duplicates_csv=None, **options):
+        """读取待下载记录（已存在的文件应跳过），返回 [dict]"""
+        raise NotImplementedError
+
+    def record_key(self, record):
+        """记录在下载台账中的键"""
+        return record['pdf_filename']
+
+    def describe(self, record):
+        """开始下载一条记录时显示的信息"""
+        return f"开始下载: {str(record['title'])[:80]}"
+
+    def open_worker(self, worker_id):
+        """为一个工作线程创建上下文（如浏览器），失败时返回 None"""
+        return True
+
+    def close_worker(self, context):
+        pass
+
+    def close(self):
+        """所有工作线程结束后调用，释放共享资源"""
+        pass
+
+    def resolve(self, context, record):
+        """返回记录的下载地址"""
+        raise NotImplementedError
+
+    @contextmanager
+    def fetch(self, context, record, url):
+        """下载到临时位置并 yield 文件路径，退出时清理临时文件；失败时抛出 DownloadError"""
+        raise NotImplementedError
+        yield
+
+    def validate(self, path):
+        """文件是完整的PDF时返回 None，否则返回原因"""
+        size = os.path.getsize(path)
+        if size < self.min_size:
+            return f"文件太小 ({size} bytes)，可能不完整"
+        with open(path, 'rb') as f:
+            if b'%PDF' not in f.read(1024):
+                return "文件不是PDF"
+        return None
+
+    def store(self, record, path):
+        """把下载好的文件移动到库中的位置，并记入索引"""
+        target = self.library.path_for(record['pdf_filename'])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+        self.library.record(record['pdf_filename'])
+        return target
+
+    def download(self, context, record):
+        """resolve -> fetch -> validate -> store，返回 (是否成功, 失败原因)"""
+        try:
+            url = self.resolve(context, record)
+            with self.fetch(context, record, url) as path:
+                problem = self.validate(path)
+                if problem:
+                    return False, problem
+                target = self.store(record, path)
+            print(f"✓ 下载成功: {target}")
+            return True, None
+        except DownloadError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}"
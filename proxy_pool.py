@@ -0,0 +1,236 @@
+"""
+代理池：多个代理之间分摊请求，健康检查与自动故障转移
+"""
+import threading
+import time
+
+import requests
+
+# 代理本身的故障：407 代理认证失败，502/504 代理网关出错或连不上目标站点；
+# 其他 5xx（如 arXiv 限流时的 503）来自目标站点，换代理也无济于事，不计入代理故障
+PROXY_AUTH_REQUIRED = 407
+PROXY_FAILURE_STATUSES = frozenset({PROXY_AUTH_REQUIRED, 502, 504})
+
+
+def is_proxy_failure(status_code):
+    return status_code in PROXY_FAILURE_STATUSES
+
+
+def normalize_proxy(proxy):
+    """将端口号或代理地址统一为代理URL，例如 7890 -> http://127.0.0.1:7890"""
+    proxy = str(proxy).strip()
+    if proxy.isdigit():
+        return f"http://127.0.0.1:{proxy}"
+    if '://' not in proxy:
+        return f"http://{proxy}"
+    return proxy
+
+
+class ProxyPool:
+    """
+    线程安全的代理池。
+
+    - 每个代理记录延迟(EWMA)、请求数、失败数和当前并发数；健康探测单独统计，不计入请求数和延迟
+    - acquire() 在健康代理中选择 (并发数+1)*延迟 最小的一个，使请求分散到所有代理
+    - 连续失败 max_failures 次的代理被剔除，冷却 cooldown 秒且健康探测成功后重新加入
+    - start_health_checks() 启动后台线程，每 probe_interval 秒探测一次所有代理
+    """
+
+    def __init__(self, proxies, probe_url="https://arxiv.org/", probe_interval=60,
+                 max_failures=3, cooldown=120, probe_timeout=10):
+        urls = [normalize_proxy(p) for p in proxies]
+        if not urls:
+            raise ValueError("代理池至少需要一个代理")
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._probe_thread = None
+        self._stats = {
+            url: {
+                'latency': 1.0,         # 平均延迟(秒)，EWMA
+                'in_flight': 0,         # 当前并发请求数
+                'requests': 0,
+                'errors': 0,
+                'probes': 0,            # 健康探测次数与失败数（不计入 requests/errors）
+                'probe_failures': 0,
+                'consecutive_failures': 0,
+                'healthy': True,
+                'ejected_at': None,
+            }
+            for url in dict.fromkeys(urls)
+        }
+
+    def __len__(self):
+        return len(self._stats)
+
+    def acquire(self, exclude=()):
+        """
+        选择一个代理并登记一次并发请求；exclude 中的代理（本次请求已经失败过的）尽量不选，
+        没有健康代理时退而选择最早被剔除的代理
+        """
+        with self._lock:
+            healthy = [url for url, s in self._stats.items() if s['healthy'] and url not in exclude]
+            if not healthy:
+                healthy = [url for url, s in self._stats.items() if s['healthy']]
+            if healthy:
+                url = min(healthy, key=lambda u: (self._stats[u]['in_flight'] + 1) * self._stats[u]['latency'])
+            else:
+                url = min(self._stats, key=lambda u: self._stats[u]['ejected_at'] or 0)
+            self._stats[url]['in_flight'] += 1
+            return url
+
+    def release(self, url, ok, latency=None):
+        """结束一次请求并记录结果"""
+        with self._lock:
+            s = self._stats[url]
+            s['in_flight'] = max(0, s['in_flight'] - 1)
+            self._record(url, ok, latency)
+
+    def _record(self, url, ok, latency):
+        s = self._stats[url]
+        s['requests'] += 1
+        if ok:
+            if latency is not None:
+                s['latency'] = 0.7 * s['latency'] + 0.3 * latency
+        else:
+            s['errors'] += 1
+        self._update_health(url, ok)
+
+    def _update_health(self, url, ok):
+        """真实请求和健康探测共用：连续失败时剔除，冷却后成功时恢复"""
+        s = self._stats[url]
+        if ok:
+            s['consecutive_failures'] = 0
+            if not s['healthy'] and time.time() - s['ejected_at'] >= self.cooldown:
+                s['healthy'] = True
+                s['ejected_at'] = None
+                print(f"[代理池] 代理恢复: {url}")
+        else:
+            s['consecutive_failures'] += 1
+            if s['healthy'] and s['consecutive_failures'] >= self.max_failures:
+                s['healthy'] = False
+                s['ejected_at'] = time.time()
+                print(f"[代理池] 代理连续失败 {s['consecutive_failures']} 次，已剔除: {url}")
+
+    @staticmethod
+    def as_requests_proxies(url):
+        return {"http": url, "https": url}
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        通过代理池发送请求，失败时自动切换到其他代理重试。
+        retries 默认为代理数量；连接错误和 407/502/504 视为代理故障，换代理重试，都失败时返回最后一个响应；
+        其他 HTTP 错误状态码（包括目标站点的 500/503）直接返回给调用方，不影响代理的健康状态。
+        """
+        retries = len(self) if retries is None else retries
+        last_error = None
+        last_response = None
+        tried = set()
+        for _ in range(max(1, retries)):
+            proxy = self.acquire(tried)
+            tried.add(proxy)
+            start = time.time()
+            try:
+                response = requests.request(method, url, proxies=self.as_requests_proxies(proxy), **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.release(proxy, ok=False)
+                last_error = e
+                continue
+            if not is_proxy_failure(response.status_code):
+                self.release(proxy, ok=True, latency=time.time() - start)
+                return response
+            self.release(proxy, ok=False)
+            if last_response is not None:
+                last_response.close()
+            last_response = response
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def probe(self, url):
+        """对单个代理做一次健康探测"""
+        start = time.time()
+        try:
+            response = requests.head(self.probe_url, proxies=self.as_requests_proxies(url),
+                                     timeout=self.probe_timeout, allow_redirects=True)
+            ok = not is_proxy_failure(response.status_code)
+        except requests.exceptions.RequestException:
+            ok = False
+        with self._lock:
+            s = self._stats[url]
+            s['probes'] += 1
+            if not ok:
+                s['probe_failures'] += 1
+            self._update_health(url, ok)
+        return ok
+
+    def probe_all(self):
+        for url in list(self._stats):
+            self.probe(url)
+
+    def _probe_loop(self):
+        while not self._stop_event.wait(self.probe_interval):
+            self.probe_all()
+
+    def start_health_checks(self):
+        """启动后台健康检查线程（守护线程，随主程序退出）"""
+        if self._probe_thread is None or not self._probe_thread.is_alive():
+            self._stop_event.clear()
+            self._probe_thread = threading.Thread(target=self._probe_loop, name="proxy-pool-probe", daemon=True)
+            self._probe_thread.start()
+
+    def stop_health_checks(self):
+        """停止后台健康检查线程，等待正在进行的探测结束"""
+        self._stop_event.set()
+        if self._probe_thread is not None:
+            self._probe_thread.join(timeout=self.probe_timeout * len(self) + 1)
+            self._probe_thread = None
+
+    def stats(self):
+        """返回每个代理的统计信息副本"""
+        with self._lock:
+            return {url: dict(s) for url, s in self._stats.items()}
+
+    def print_stats(self):
+        print("\n--- 代理池统计 ---")
+        for url, s in self.stats().items():
+            error_rate = s['errors'] / s['requests'] * 100 if s['requests'] else 0
+            status = '健康' if s['healthy'] else '已剔除'
+            print(f"{url}: {status} | 请求 {s['requests']} | 错误率 {error_rate:.1f}% | 平均延迟 {s['latency']:.2f}s"
+                  f" | 健康探测 {s['probes']} 次，失败 {s['probe_failures']}")
+
+
+def build_proxies(proxies_port):
+    """
+    根据 proxies_port 构造代理配置：
+    - None: 不使用代理
+    - 单个端口/地址: 返回 requests 的 proxies 字典（与原行为一致）
+    - 端口/地址列表: 返回 ProxyPool，并启动健康检查
+    """
+    if proxies_port is None:
+        return None
+    if isinstance(proxies_port, ProxyPool):
+        return proxies_port
+    if isinstance(proxies_port, (list, tuple, set)):
+        pool = ProxyPool(proxies_port)
+        pool.start_health_checks()
+        print(f"使用代理池，共 {len(pool)} 个代理")
+        return pool
+    return ProxyPool.as_requests_proxies(normalize_proxy(proxies_port))
+
+
+def proxied_request(method, url, proxies=None, **kwargs):
+    """proxies 既可以是 requests 的 proxies 字典，也可以是 ProxyPool"""
+    if isinstance(proxies, ProxyPool):
+        return proxies.request(method, url, **kwargs)
+    return requests.request(method, url, proxies=proxies, **kwargs)
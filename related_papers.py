@@ -0,0 +1,259 @@
+"""
+相关论文推荐：基于 title + abstract 的 TF-IDF 余弦相似度
+
+- 只依赖 numpy：词频矩阵同时按行(CSR)和按列(CSC，即倒排表)保存，
+  查询时只取查询词的倒排表，用一次 bincount 累加所有论文的得分
+- 持久化为 .npz：词表、文档频率、CSR/CSC 三元组和按当前 IDF 计算的文档范数
+- 增量更新：只对新论文分词，行追加到 CSR，倒排表按词稳定合并，
+  IDF 随论文数变化，只需重新计算范数（对非零元素的一次向量化运算）
+
+用法:
+    uv run related_papers.py update paper_result_no.csv
+    uv run related_papers.py similar 123 --k 10
+    uv run related_papers.py query "LLM-based code review"
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from rename import paper_number_key
+
+DEFAULT_TFIDF_PATH = "related_tfidf.npz"
+TOKEN_PATTERN = r'[a-z][a-z0-9\-]+'
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just may me might more most must my no nor not of off on once only or
+other our ours out over own same she should so some such than that the their theirs them then there these they
+this those through to too under until up upon very was we were what when where which while who whom why will
+with would you your we us via using based paper propose proposed show results approach study
+""".split())
+
+
+def tokenize_texts(texts):
+    """
+    向量化分词：返回 (文档下标数组, 词数组)，每个 (文档, 词) 出现一次对应一项（未去重）
+    """
+    tokens = pd.Series(texts).fillna('').str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    tokens = tokens[~tokens.isin(STOPWORDS)]
+    return tokens.index.to_numpy(dtype=np.int64), tokens.to_numpy(dtype=object)
+
+
+class TfidfIndex:
+    """
+    论文的 TF-IDF 索引。行 i 对应 keys[i] / nos[i]；词频取 1 + log(tf)，
+    权重为 词频 * idf，idf = log((1 + N) / (1 + df)) + 1。
+    """
+
+    def __init__(self):
+        self.vocab = []
+        self.term_ids = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros(0, dtype=object)
+        self.nos = np.zeros(0, dtype=np.int64)
+        self.row_ptr = np.zeros(1, dtype=np.int64)
+        self.row_terms = np.zeros(0, dtype=np.int32)
+        self.row_tf = np.zeros(0, dtype=np.float32)
+        self.col_ptr = np.zeros(1, dtype=np.int64)
+        self.col_rows = np.zeros(0, dtype=np.int32)
+        self.col_tf = np.zeros(0, dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self._key_rows = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def idf(self):
+        return (np.log((1.0 + len(self)) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    @property
+    def key_rows(self):
+        if self._key_rows is None:
+            self._key_rows = {key: row for row, key in enumerate(self.keys)}
+        return self._key_rows
+
+    def _term_counts(self, texts, grow_vocab):
+        """分词并统计词频，返回 (文档下标, 词id, 1+log(tf))，按 (文档, 词id) 排序"""
+        doc_idx, words = tokenize_texts(texts)
+        if grow_vocab:
+            for word in pd.unique(words):
+                if word not in self.term_ids:
+                    self.term_ids[word] = len(self.vocab)
+                    self.vocab.append(word)
+        term_idx = pd.Series(words).map(self.term_ids).to_numpy(dtype=np.float64)
+        known = ~np.isnan(term_idx)
+        doc_idx, term_idx = doc_idx[known], term_idx[known].astype(np.int64)
+
+        pairs, counts = np.unique(doc_idx * max(len(self.vocab), 1) + term_idx, return_counts=True)
+        docs, terms = np.divmod(pairs, max(len(self.vocab), 1))
+        return docs, terms.astype(np.int32), (1.0 + np.log(counts)).astype(np.float32)
+
+    def add(self, papers):
+        """
+        追加 papers（DataFrame，需要 title / abstract / pdf_link 列）中尚未收录的论文，返回新增数。
+        """
+        keys = papers.apply(paper_number_key, axis=1) if len(papers) else pd.Series([], dtype=object)
+        is_new = keys.notna() & ~keys.isin(self.key_rows) & ~keys.duplicated()
+        papers, keys = papers[is_new], keys[is_new]
+        if papers.empty:
+            return 0
+
+        texts = (papers['title'].fillna('') + ' ' + papers.get('abstract', pd.Series('', index=papers.index)).fillna('')).tolist()
+        docs, terms, tf = self._term_counts(texts, grow_vocab=True)
+        first_row = len(self)
+        rows = (docs + first_row).astype(np.int32)
+
+        # CSR：新行追加在末尾
+        row_lengths = np.bincount(docs, minlength=len(papers))
+        self.row_ptr = np.concatenate([self.row_ptr, self.row_ptr[-1] + np.cumsum(row_lengths)])
+        self.row_terms = np.concatenate([self.row_terms, terms])
+        self.row_tf = np.concatenate([self.row_tf, tf])
+
+        # CSC：旧倒排表已按词排序，新项行号更大，按词稳定排序即可合并且每个词内行号有序
+        old_cols = np.repeat(np.arange(len(self.col_ptr) - 1, dtype=np.int32), np.diff(self.col_ptr))
+        all_cols = np.concatenate([old_cols, terms])
+        order = np.argsort(all_cols, kind='stable')
+        self.col_rows = np.concatenate([self.col_rows, rows])[order]
+        self.col_tf = np.concatenate([self.col_tf, tf])[order]
+        self.col_ptr = np.concatenate([[0], np.cumsum(np.bincount(all_cols, minlength=len(self.vocab)))]).astype(np.int64)
+
+        self.df = np.diff(self.col_ptr)
+        nos = pd.to_numeric(papers['no'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64) \
+            if 'no' in papers.columns else np.full(len(papers), -1, dtype=np.int64)
+        self.keys = np.concatenate([self.keys, keys.to_numpy(dtype=object)])
+        self.nos = np.concatenate([self.nos, nos])
+        self._key_rows = None
+        self._update_norms()
+        return len(papers)
+
+    def _update_norms(self):
+        # IDF 随论文数变化，所有文档的范数一起重新计算
+        weights = self.row_tf * self.idf[self.row_terms]
+        row_ids = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.row_ptr))
+        self.norms = np.sqrt(np.bincount(row_ids, weights=weights.astype(np.float64) ** 2, minlength=len(self))).astype(np.float32)
+
+    def _scores(self, terms, weights):
+        """查询向量（词id, 权重）与所有论文的余弦相似度"""
+        idf = self.idf
+        weights = weights * idf[terms]
+        query_norm = float(np.sqrt(np.sum(weights.astype(np.float64) ** 2)))
+        if query_norm == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        starts, ends = self.col_ptr[terms], self.col_ptr[terms + 1]
+        lengths = ends - starts
+        # 拼接所有查询词的倒排表切片，一次 bincount 累加
+        positions = np.repeat(starts - np.cumsum(np.concatenate([[0], lengths[:-1]])), lengths) + np.arange(lengths.sum())
+        contributions = self.col_tf[positions] * np.repeat(weights * idf[terms], lengths)
+        scores = np.bincount(self.col_rows[positions], weights=contributions, minlength=len(self))
+        return scores / (np.maximum(self.norms, 1e-12) * query_norm)
+
+    def _top_k(self, scores, k, exclude=None):
+        if exclude is not None:
+            scores[exclude] = -1
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{'no': int(self.nos[i]) if self.nos[i] >= 0 else None, 'key': self.keys[i], 'score': float(scores[i])}
+                for i in top if scores[i] > 0]
+
+    def similar(self, paper, k=10):
+        """
+        与某篇论文最相似的 k 篇，paper 为编号 no（int）或 arXiv ID / 'title:...' 键。
+        返回 [{'no', 'key', 'score'}]，按相似度降序，不含该论文本身。
+        """
+        if isinstance(paper, (int, np.integer)):
+            matches = np.flatnonzero(self.nos == paper)
+            if not len(matches):
+                raise KeyError(f"索引中没有编号 {paper}")
+            row = int(matches[0])
+        else:
+            row = self.key_rows[paper]
+        start, end = self.row_ptr[row], self.row_ptr[row + 1]
+        scores = self._scores(self.row_terms[start:end].astype(np.int64), self.row_tf[start:end])
+        return self._top_k(scores, k, exclude=row)
+
+    def query(self, text, k=10):
+        """与任意文本最相似的 k 篇论文"""
+        docs, terms, tf = self._term_counts([text], grow_vocab=False)
+        return self._top_k(self._scores(terms.astype(np.int64), tf), k)
+
+    def save(self, path=DEFAULT_TFIDF_PATH):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, vocab=np.array(self.vocab, dtype=str), keys=self.keys.astype(str), nos=self.nos,
+                 row_ptr=self.row_ptr, row_terms=self.row_terms, row_tf=self.row_tf,
+                 col_ptr=self.col_ptr, col_rows=self.col_rows, col_tf=self.col_tf, norms=self.norms)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_TFIDF_PATH):
+        """加载索引；文件不存在时返回空索引"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            index.vocab = data['vocab'].tolist()
+            index.keys = data['keys'].astype(object)
+            for name in ('nos', 'row_ptr', 'row_terms', 'row_tf', 'col_ptr', 'col_rows', 'col_tf', 'norms'):
+                setattr(index, name, data[name])
+        index.term_ids = {term: i for i, term in enumerate(index.vocab)}
+        index.df = np.diff(index.col_ptr)
+        return index
+
+
+def update_related_index(path_of_csv, index_path=DEFAULT_TFIDF_PATH):
+    """从目录CSV增量更新 TF-IDF 索引，返回新增论文数"""
+    start = time.perf_counter()
+    index = TfidfIndex.load(index_path)
+    added = index.add(pd.read_csv(path_of_csv, encoding='utf-8'))
+    if added:
+        index.save(index_path)
+    print(f"[INFO] TF-IDF 索引新增 {added} 篇，共 {len(index)} 篇，词表 {len(index.vocab)}，"
+          f"用时 {time.perf_counter() - start:.2f}s -> '{index_path}'")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相关论文推荐 (TF-IDF)")
+    parser.add_argument('--index', default=DEFAULT_TFIDF_PATH, help="索引文件路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help="从CSV增量更新索引")
+    update_parser.add_argument('csv', help="论文目录CSV，如 paper_result_no.csv")
+
+    similar_parser = subparsers.add_parser('similar', help="与某篇论文相似的论文")
+    similar_parser.add_argument('paper', help="论文编号 no 或 arXiv ID")
+    similar_parser.add_argument('--k', type=int, default=10)
+
+    query_parser = subparsers.add_parser('query', help="与一段文本相似的论文")
+    query_parser.add_argument('text')
+    query_parser.add_argument('--k', type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == 'update':
+        update_related_index(args.csv, args.index)
+        return
+
+    index = TfidfIndex.load(args.index)
+    start = time.perf_counter()
+    try:
+        if args.command == 'similar':
+            results = index.similar(int(args.paper) if args.paper.isdigit() else args.paper, args.k)
+        else:
+            results = index.query(args.text, args.k)
+    except KeyError as e:
+        print(f"未找到论文: {e}")
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    for result in results:
+        print(f"{result['no'] if result['no'] is not None else '-':>6}  {result['key']:<20}  {result['score']:.3f}")
+    print(f"[INFO] 共 {len(results)} 条结果，用时 {elapsed:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,32 @@
+import os
+
 import pandas as pd
 
-def add_sequential_no_column(input_csv_path, output_csv_path):
+from csv_stream import stream_csv
+from download_from_csv import extract_arxiv_id
+
+DEFAULT_NO_MAP_PATH = 'paper_no_map.csv'
+
+def add_sequential_no_column(input_csv_path, output_csv_path, chunksize=None):
     """
     Adds a 'no' column with sequential numbers to a CSV file.
 
     Args:
         input_csv_path (str): The path to the input CSV file.
         output_csv_path (str): The path where the new CSV file with the 'no' column will be saved.
+        chunksize (int, optional): If given, the file is read and written in chunks of this many rows,
+            keeping memory bounded for very large catalogs.
     """
     try:
+        if chunksize is not None:
+            def number_chunk(chunk, offset):
+                chunk.insert(0, 'no', range(offset + 1, offset + 1 + len(chunk)))
+                return chunk
+
+            total = stream_csv(input_csv_path, output_csv_path, number_chunk, chunksize=chunksize)
+            print(f"Successfully numbered {total} rows of '{input_csv_path}' in chunks and saved to '{output_csv_path}'")
+            return
+
         # Read the CSV file into a pandas DataFrame
         df = pd.read_csv(input_csv_path)
 
@@ -26,6 +44,123 @@ def add_sequential_no_column(input_csv_path, output_csv_path):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def paper_number_key(row):
+    """
+    Returns the stable key a paper is numbered by: its arXiv ID, or 'title:<title>' when no ID is found.
+    """
+    arxiv_id = extract_arxiv_id(row.get('pdf_link'))
+    if arxiv_id:
+        return arxiv_id
+    title = row.get('title')
+    return f"title:{title}" if isinstance(title, str) else None
+
+
+def _frame_keys(df):
+    if df.empty:
+        return pd.Series([], dtype=object)
+    return df.apply(paper_number_key, axis=1)
+
+
+def load_number_map(mapping_path=DEFAULT_NO_MAP_PATH):
+    """
+    Loads the persisted key -> no mapping (a CSV with 'key' and 'no' columns).
+    Returns an empty dict if the file does not exist yet.
+    """
+    if not os.path.exists(mapping_path):
+        return {}
+    mapping = pd.read_csv(mapping_path, dtype={'key': str}, encoding='utf-8')
+    return dict(zip(mapping['key'], mapping['no'].astype(int)))
+
+
+def _append_number_map(entries, mapping_path):
+    """Appends new (key, no) entries to the mapping file, writing the header only for a new file."""
+    if not entries:
+        return
+    new_file = not os.path.exists(mapping_path)
+    pd.DataFrame(entries, columns=['key', 'no']).to_csv(mapping_path, mode='a', header=new_file,
+                                                        index=False, encoding='utf-8')
+
+
+def update_stable_numbers(input_csv_path, output_csv_path, mapping_path=DEFAULT_NO_MAP_PATH, chunksize=None):
+    """
+    Numbers papers by a persisted arXiv ID -> 'no' mapping instead of by row position.
+
+    Papers that already have a number keep it; new papers get the next free numbers in input order.
+    Both the mapping file and output_csv_path are only appended to: rows already present in the
+    output are left untouched, so files named no_year_title.pdf stay valid after a fresh crawl
+    inserts new papers at the top of the input.
+
+    On the first run with an existing numbered output but no mapping file, the mapping is seeded
+    from the output so the numbers assigned by add_sequential_no_column are preserved.
+
+    Args:
+        input_csv_path (str): The crawled catalog, e.g. paper_result.csv.
+        output_csv_path (str): The numbered catalog, e.g. paper_result_no.csv.
+        mapping_path (str): Where the key -> no mapping is persisted.
+        chunksize (int, optional): If given, the input is read in chunks of this many rows.
+
+    Returns:
+        int: The number of rows appended to the output.
+    """
+    try:
+        mapping = load_number_map(mapping_path)
+        present = set()
+        output_columns = None
+        if os.path.exists(output_csv_path):
+            existing = pd.read_csv(output_csv_path, encoding='utf-8')
+            output_columns = list(existing.columns)
+            existing_keys = _frame_keys(existing)
+            present = set(existing_keys.dropna())
+            if not mapping and 'no' in existing.columns:
+                seeded = [(key, int(no)) for key, no in zip(existing_keys, existing['no'])
+                          if key is not None and pd.notna(no)]
+                seeded = list(dict(seeded).items())
+                _append_number_map(seeded, mapping_path)
+                mapping = dict(seeded)
+                print(f"Seeded '{mapping_path}' with {len(mapping)} numbers from '{output_csv_path}'")
+
+        next_no = max(mapping.values(), default=0) + 1
+        chunks = pd.read_csv(input_csv_path, encoding='utf-8', chunksize=chunksize) if chunksize \
+            else [pd.read_csv(input_csv_path, encoding='utf-8')]
+
+        appended = assigned = 0
+        for chunk in chunks:
+            keys = _frame_keys(chunk)
+            is_new = keys.notna() & ~keys.isin(present) & ~keys.duplicated()
+            chunk, keys = chunk[is_new], keys[is_new]
+            if chunk.empty:
+                continue
+
+            new_entries = []
+            numbers = []
+            for key in keys:
+                if key not in mapping:
+                    mapping[key] = next_no
+                    new_entries.append((key, next_no))
+                    next_no += 1
+                numbers.append(mapping[key])
+            _append_number_map(new_entries, mapping_path)
+
+            chunk = chunk.drop(columns=['no'], errors='ignore')
+            chunk.insert(0, 'no', numbers)
+            if output_columns is None:
+                chunk.to_csv(output_csv_path, index=False, encoding='utf-8')
+                output_columns = list(chunk.columns)
+            else:
+                chunk.reindex(columns=output_columns).to_csv(output_csv_path, mode='a', header=False,
+                                                             index=False, encoding='utf-8')
+            present.update(keys)
+            appended += len(chunk)
+            assigned += len(new_entries)
+
+        print(f"Appended {appended} rows to '{output_csv_path}' ({assigned} new numbers, next free no is {next_no})")
+        return appended
+
+    except FileNotFoundError:
+        print(f"Error: The file '{input_csv_path}' was not found. Please check the path.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
     # --- Configuration ---
     # Replace 'your_input.csv' with the actual name of your CSV file
@@ -34,4 +169,6 @@ if __name__ == "__main__":
     output_csv_file = 'paper_result_no.csv'
     # -------------------
 
-    add_sequential_no_column(input_csv_file, output_csv_file)
\ No newline at end of file
+    # Existing papers keep their numbers across crawls; new papers are appended with the next free numbers.
+    # Use add_sequential_no_column(input_csv_file, output_csv_file) to renumber everything by row position.
+    update_stable_numbers(input_csv_file, output_csv_file)
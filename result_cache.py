@@ -0,0 +1,155 @@
+"""
+筛选结果缓存：以输入文件指纹 + 规范化的筛选条件为键，复用上一次的筛选结果
+
+- 命中：输入文件大小和修改时间未变（或内容哈希相同）时，直接返回缓存的结果
+- 增量：输入文件只在末尾追加了新行时，只对新行做筛选并追加到缓存结果
+- 淘汰：缓存总大小超过上限时按最近使用时间(LRU)删除
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = ".filter_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _hash_prefix(path, length, block_size=1024 * 1024):
+    """计算文件前 length 字节的 sha256"""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _ends_with_newline(path, length):
+    if length == 0:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(length - 1)
+        return f.read(1) == b'\n'
+
+
+def _read_appended_rows(path, offset, encoding):
+    """读取文件中 offset 字节之后追加的行，列名取自原文件表头"""
+    columns = pd.read_csv(path, encoding=encoding, nrows=0).columns
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return pd.read_csv(f, encoding=encoding, header=None, names=columns)
+
+
+class FilterResultCache:
+    """
+    磁盘上的筛选结果缓存。每个条目由 <key>.csv（筛选结果）和 <key>.json（元数据）组成。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, input_csv, predicate):
+        key = hashlib.sha1(f"{os.path.abspath(input_csv)}\x1f{predicate}".encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.csv", f"{base}.json"
+
+    def _load_meta(self, meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta_path, meta):
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def get_or_compute(self, input_csv, predicate, compute, encoding='utf-8'):
+        """
+        返回 (筛选结果CSV路径, 状态)，状态为 'hit' / 'incremental' / 'miss'。
+        predicate 为规范化的筛选条件字符串；compute(df) 对任意行块返回筛选后的行，
+        要求逐行独立，这样追加行的结果可以直接拼接在旧结果之后。
+        """
+        result_path, meta_path = self._paths(input_csv, predicate)
+        stat = os.stat(input_csv)
+        meta = self._load_meta(meta_path) if os.path.exists(result_path) else None
+        status = 'miss'
+
+        if meta is not None and meta['size'] == stat.st_size:
+            if meta['mtime'] == stat.st_mtime or _hash_prefix(input_csv, stat.st_size) == meta['sha256']:
+                status = 'hit'
+        elif (meta is not None and meta['size'] < stat.st_size
+              and _ends_with_newline(input_csv, meta['size'])
+              and _hash_prefix(input_csv, meta['size']) == meta['sha256']):
+            status = 'incremental'
+
+        if status == 'incremental':
+            appended = compute(_read_appended_rows(input_csv, meta['size'], encoding))
+            appended.to_csv(result_path, mode='a', header=False, index=False, encoding=encoding)
+        elif status == 'miss':
+            compute(pd.read_csv(input_csv, encoding=encoding)).to_csv(result_path, index=False, encoding=encoding)
+
+        if status != 'hit' or meta['mtime'] != stat.st_mtime:
+            meta = {
+                'input_csv': os.path.abspath(input_csv),
+                'predicate': predicate,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': _hash_prefix(input_csv, stat.st_size),
+            }
+        meta['last_used'] = time.time()
+        self._save_meta(meta_path, meta)
+        self.evict()
+        return result_path, status
+
+    def evict(self):
+        """缓存总大小超过 max_bytes 时，按最近使用时间删除最旧的条目"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            result_path = meta_path[:-5] + '.csv'
+            meta = self._load_meta(meta_path) or {}
+            size = os.path.getsize(result_path) if os.path.exists(result_path) else 0
+            entries.append((meta.get('last_used', 0), meta_path, result_path, size))
+            total += size
+
+        for _, meta_path, result_path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (result_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+
+def cached_filter(input_csv, predicate, compute, save_path=None, cache_dir=DEFAULT_CACHE_DIR,
+                  max_bytes=DEFAULT_MAX_BYTES, encoding='utf-8'):
+    """
+    带缓存的筛选：返回筛选后的 DataFrame，需要时把结果复制到 save_path。
+    """
+    cache = FilterResultCache(cache_dir, max_bytes)
+    result_path, status = cache.get_or_compute(input_csv, predicate, compute, encoding)
+    status_text = {'hit': '命中缓存', 'incremental': '增量更新缓存', 'miss': '未命中缓存，已重新计算'}[status]
+    print(f"[CACHE] {status_text}: {predicate}")
+
+    if save_path:
+        shutil.copyfile(result_path, save_path)
+    return pd.read_csv(result_path, encoding=encoding)
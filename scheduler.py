@@ -0,0 +1,203 @@
+"""
+统一下载调度器：arXiv、EBSCO、INFORMS 等来源（见 providers）共用
+
+- 并发：workers 个工作线程从共享队列领取记录，每个线程有自己的上下文（浏览器、HTTP 会话等）
+- 全局节流：所有线程合计，相邻两次下载开始之间至少间隔 min_interval 秒
+- 重试：失败的记录放回队尾，最多尝试 max_attempts 次
+- 失败隔离：浏览器类来源连续失败多次时重启该工作者，重启次数用完则该线程退出，剩余记录由其他线程继续
+- 台账：每条记录的最终结果追加写入 download_ledger.csv（来源、键、结果、尝试次数、用时、失败原因）
+- 任务状态：传入 job（见 download_job）时同时更新该任务中记录的状态，中断后可继续、失败的记录可单独重试
+
+用法:
+    uv run scheduler.py arxiv paper_result_no.csv --workers 3
+    uv run scheduler.py ebsco ebsco_csvs --output pdfs --workers 2 --min-interval 10
+    uv run scheduler.py informs-http informs_csvs --output informs_pdfs --workers 4 --min-interval 1
+"""
+import argparse
+import csv
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from browser_pool import PacingLimiter
+from providers import PROVIDERS, get_provider
+
+DEFAULT_LEDGER = "download_ledger.csv"
+LEDGER_COLUMNS = ['time', 'provider', 'key', 'title', 'status', 'attempts', 'seconds', 'error']
+
+
+class DownloadScheduler:
+    """
+    用法: DownloadScheduler(provider, workers=3).run(records) -> [(record, 是否成功)]
+    workers / min_interval / max_attempts 为 None 时使用来源的默认值；ledger_path 为 None 时不写台账。
+    job: download_job.DownloadJob，每条记录完成时更新其状态；
+         final=False 表示失败的记录之后还会交给其他流程，失败只作为一次尝试记入任务（记录仍为 pending）
+    """
+
+    def __init__(self, provider, workers=None, min_interval=None, max_attempts=None, ledger_path=DEFAULT_LEDGER,
+                 max_consecutive_failures=3, max_restarts=2, job=None, final=True):
+        self.provider = provider
+        self.workers = max(1, workers or provider.workers)
+        self.limiter = PacingLimiter(provider.min_interval if min_interval is None else min_interval)
+        self.max_attempts = max(1, max_attempts or provider.max_attempts)
+        self.ledger_path = ledger_path
+        self.max_consecutive_failures = max_consecutive_failures
+        self.max_restarts = max_restarts
+        self.job = job
+        self.final = final
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._results = []
+        self._total = 0
+
+    def _write_ledger(self, record, success, attempts, seconds, error):
+        if self.ledger_path is None:
+            return
+        row = [datetime.now().isoformat(timespec='seconds'), self.provider.name, self.provider.record_key(record),
+               record.get('title', ''), 'ok' if success else 'failed', attempts, f"{seconds:.1f}", error or '']
+        new_file = not os.path.exists(self.ledger_path)
+        with open(self.ledger_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(LEDGER_COLUMNS)
+            writer.writerow(row)
+
+    def _finish(self, worker_id, record, success, attempts, seconds, error, attempted=True):
+        with self._lock:
+            self._results.append((record, success))
+            self._write_ledger(record, success, attempts, seconds, error)
+            done = len(self._results)
+            succeeded = sum(1 for _, ok in self._results if ok)
+        # 没有实际尝试的记录在任务中保持 pending，下次继续
+        if self.job is not None and attempted:
+            if success or self.final:
+                self.job.finish(record, success, attempts, error)
+            else:
+                self.job.note(record, attempts, f"{self.provider.name}: {error}")
+        status = '✅ 成功' if success else f'❌ 失败 ({error})'
+        print(f"📊 [{self.provider.name}#{worker_id}] {status} | 进度 {done}/{self._total}，"
+              f"成功 {succeeded}，失败 {done - succeeded}")
+
+    def _restart(self, worker_id, context, restarts):
+        """关闭并重新创建工作者上下文，返回新的上下文；重启次数用完或创建失败时返回 None"""
+        self.provider.close_worker(context)
+        if restarts > self.max_restarts:
+            print(f"[{self.provider.name}#{worker_id}] 连续失败且已重启 {self.max_restarts} 次，退出")
+            return None
+        print(f"[{self.provider.name}#{worker_id}] 连续失败 {self.max_consecutive_failures} 次，"
+              f"重启 ({restarts}/{self.max_restarts})")
+        return self.provider.open_worker(worker_id)
+
+    def _worker(self, worker_id):
+        context = self.provider.open_worker(worker_id)
+        if not context:
+            print(f"[{self.provider.name}#{worker_id}] 启动失败，退出")
+            return
+        failures = restarts = 0
+        try:
+            while True:
+                try:
+                    record, attempt = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+
+                self.limiter.wait()
+                print(f"\n[{self.provider.name}#{worker_id}] {self.provider.describe(record)}")
+                start = time.perf_counter()
+                try:
+                    success, error = self.provider.download(context, record)
+                except Exception as e:
+                    print(traceback.format_exc())
+                    success, error = False, f"{type(e).__name__}: {e}"
+                seconds = time.perf_counter() - start
+
+                if success or attempt >= self.max_attempts:
+                    self._finish(worker_id, record, success, attempt, seconds, error)
+                else:
+                    print(f"[{self.provider.name}#{worker_id}] 失败 ({error})，稍后重试 ({attempt}/{self.max_attempts})")
+                    self._queue.put((record, attempt + 1))
+
+                failures = 0 if success else failures + 1
+                if self.provider.restart_on_failures and failures >= self.max_consecutive_failures:
+                    restarts += 1
+                    context = self._restart(worker_id, context, restarts)
+                    if not context:
+                        return
+                    failures = 0
+        finally:
+            if context:
+                self.provider.close_worker(context)
+
+    def run(self, records):
+        """处理全部记录，返回 [(record, 是否成功)]；所有工作线程都退出后未处理的记录记为失败"""
+        records = list(records)
+        self._total = len(records)
+        self._results = []
+        for record in records:
+            self._queue.put((record, 1))
+
+        start = time.perf_counter()
+        workers = min(self.workers, len(records))
+        threads = [threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+                   for worker_id in range(workers)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.provider.close()
+
+        while True:
+            try:
+                record, attempt = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._finish('-', record, False, attempt - 1, 0, "没有可用的工作者", attempted=attempt > 1)
+
+        elapsed = time.perf_counter() - start
+        succeeded = sum(1 for _, ok in self._results if ok)
+        print(f"\n📈 {self.provider.name}: 共 {len(self._results)} 条，成功 {succeeded}，"
+              f"失败 {len(self._results) - succeeded}，用时 {elapsed:.1f}s")
+        return list(self._results)
+
+
+def write_failed_records(results, path, columns):
+    """把失败的记录（只保留 columns 中的字段）写入 CSV，没有失败时不写，返回失败记录数"""
+    failed = [record for record, success in results if not success]
+    if failed:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(failed)
+        print(f"失败记录已保存到: {path}")
+    return len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统一下载调度：按来源读取记录并下载PDF")
+    parser.add_argument('provider', choices=sorted(PROVIDERS), help="下载来源")
+    parser.add_argument('source', help="arxiv 为论文CSV，ebsco/informs 为CSV文件夹")
+    parser.add_argument('--output', default=None, help="PDF 输出目录，默认使用各来源原来的目录")
+    parser.add_argument('--layout', default=None, help="输出目录布局 (flat/year/hash)，见 pdf_library")
+    parser.add_argument('--duplicates', default=None, help="dedup.py 输出的重复簇文件，跳过非规范记录")
+    parser.add_argument('--workers', type=int, default=None, help="并发数，默认使用来源的默认值")
+    parser.add_argument('--min-interval', type=float, default=None, help="所有工作者合计的下载间隔（秒）")
+    parser.add_argument('--max-attempts', type=int, default=None, help="每条记录最多尝试次数")
+    parser.add_argument('--ledger', default=DEFAULT_LEDGER, help="下载台账路径")
+    args = parser.parse_args()
+
+    options = {'layout': args.layout, 'workers': args.workers}
+    if args.output:
+        options['output_folder'] = args.output
+    provider = get_provider(args.provider, **options)
+    records = provider.load_records(args.source, duplicates_csv=args.duplicates)
+    DownloadScheduler(provider, min_interval=args.min_interval, max_attempts=args.max_attempts,
+                      ledger_path=args.ledger).run(records)
+
+
+if __name__ == '__main__':
+    main()
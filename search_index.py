@@ -0,0 +1,160 @@
+"""
+论文目录全文检索：基于 SQLite FTS5 的持久化倒排索引
+
+- 索引 title / abstract / comment / authors，porter 词干 + unicode61 分词
+- 支持 AND / OR / NOT、"短语"、字段限定 (title: abstract: comment: authors:)，按 BM25 排序
+- 按 arXiv ID 增量更新：只写入新增或内容变化的论文，无需重建
+
+用法:
+    uv run search_index.py update paper_result_no.csv
+    uv run search_index.py query '"code review" AND LLM'
+"""
+import argparse
+import hashlib
+import sqlite3
+import time
+
+import pandas as pd
+
+from download_from_csv import extract_arxiv_id
+
+DEFAULT_INDEX_PATH = "paper_index.sqlite"
+INDEXED_FIELDS = ('title', 'abstract', 'comment', 'authors')
+# bm25 列权重，顺序与 papers_fts 的列一致（前两列不参与索引）
+BM25_WEIGHTS = (0.0, 0.0, 3.0, 1.0, 1.0, 0.5)
+
+
+def open_index(index_path=DEFAULT_INDEX_PATH):
+    """打开（必要时创建）索引数据库"""
+    conn = sqlite3.connect(index_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS papers (
+            paper_key TEXT PRIMARY KEY,
+            fts_rowid INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+            paper_key UNINDEXED, no UNINDEXED, title, abstract, comment, authors,
+            tokenize = 'porter unicode61'
+        );
+    """)
+    return conn
+
+
+def paper_key(row):
+    """论文的稳定键：优先使用 arXiv ID，否则使用标题"""
+    arxiv_id = extract_arxiv_id(row.get('pdf_link'))
+    if arxiv_id:
+        return arxiv_id
+    title = row.get('title')
+    return f"title:{title}" if isinstance(title, str) else None
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def update_index(papers, index_path=DEFAULT_INDEX_PATH):
+    """
+    将论文写入索引。papers 可以是 DataFrame 或字典列表（如 get_paper_info 的结果）。
+    已存在且内容未变化的论文被跳过；内容变化（包括新编号）的论文被替换。
+    返回 (新增数, 更新数)。
+    """
+    records = papers.to_dict('records') if isinstance(papers, pd.DataFrame) else list(papers)
+    conn = open_index(index_path)
+    added = updated = 0
+    try:
+        existing = dict(conn.execute("SELECT paper_key, digest FROM papers"))
+        with conn:
+            for row in records:
+                key = paper_key(row)
+                if key is None:
+                    continue
+                no = _clean(row.get('no'))
+                values = [_clean(row.get(field)) for field in INDEXED_FIELDS]
+                digest = hashlib.sha1('\x1f'.join([no] + values).encode('utf-8')).hexdigest()
+                old_digest = existing.get(key)
+                if old_digest == digest:
+                    continue
+                if old_digest is not None:
+                    conn.execute("DELETE FROM papers_fts WHERE rowid = (SELECT fts_rowid FROM papers WHERE paper_key = ?)", (key,))
+                    updated += 1
+                else:
+                    added += 1
+                cursor = conn.execute(
+                    "INSERT INTO papers_fts (paper_key, no, title, abstract, comment, authors) VALUES (?, ?, ?, ?, ?, ?)",
+                    [key, no] + values)
+                conn.execute("INSERT OR REPLACE INTO papers (paper_key, fts_rowid, digest) VALUES (?, ?, ?)",
+                             (key, cursor.lastrowid, digest))
+                existing[key] = digest
+    finally:
+        conn.close()
+    return added, updated
+
+
+def update_index_from_csv(path_of_csv, index_path=DEFAULT_INDEX_PATH, chunksize=50_000):
+    """从目录CSV增量更新索引"""
+    start = time.perf_counter()
+    added = updated = 0
+    for chunk in pd.read_csv(path_of_csv, encoding='utf-8', chunksize=chunksize):
+        chunk_added, chunk_updated = update_index(chunk, index_path)
+        added += chunk_added
+        updated += chunk_updated
+    print(f"[INFO] 索引更新完成: 新增 {added} 篇，更新 {updated} 篇，用时 {time.perf_counter() - start:.2f}s -> '{index_path}'")
+    return added, updated
+
+
+def search(query, index_path=DEFAULT_INDEX_PATH, limit=20):
+    """
+    使用 FTS5 查询语法检索，按 BM25 相关度返回 [{'no', 'arxiv_id', 'title', 'score'}]。
+    例如: '"code review" AND (LLM OR "large language model")', 'title: survey NOT comment: workshop'
+    """
+    conn = open_index(index_path)
+    try:
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        sql = (f"SELECT no, paper_key, title, bm25(papers_fts, {weights}) AS score "
+               f"FROM papers_fts WHERE papers_fts MATCH ? ORDER BY score")
+        params = [query]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [{'no': no, 'arxiv_id': key, 'title': title, 'score': -score} for no, key, title, score in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="论文目录全文检索")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help="索引文件路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help="从CSV增量更新索引")
+    update_parser.add_argument('csv', help="论文目录CSV，如 paper_result_no.csv")
+
+    query_parser = subparsers.add_parser('query', help="检索论文")
+    query_parser.add_argument('query', help="FTS5 查询，如 '\"code review\" AND LLM'")
+    query_parser.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == 'update':
+        update_index_from_csv(args.csv, args.index)
+    else:
+        start = time.perf_counter()
+        try:
+            results = search(args.query, args.index, args.limit)
+        except sqlite3.OperationalError as e:
+            print(f"查询语法错误: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(f"{result['no'] or '-':>6}  {result['arxiv_id']:<20}  {result['score']:6.2f}  {result['title'][:80]}")
+        print(f"[INFO] 共 {len(results)} 条结果，用时 {elapsed:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()